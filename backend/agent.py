@@ -1,8 +1,13 @@
-from llama_cpp import Llama
 import os
 import json
 import re
+import time
+import threading
+from collections import OrderedDict
 from backend.mcp_server import read_transactions, summarize_spending, generate_spending_chart
+from backend.speculative import speculative_config_from_env, build_draft_model
+from backend.tuning import load_inference_settings
+from backend.cascade import cascade_config_from_env, build_tool_grammar, ROUTER_HINT, ROUTER_MAX_TOKENS, ANSWER_SENTINEL
 
 # Tool Definitions for Llama (OpenAI Compatible)
 TOOLS_SCHEMA = [
@@ -54,31 +59,277 @@ TOOLS_SCHEMA = [
     }
 ]
 
+TOOL_NAMES = [tool["function"]["name"] for tool in TOOLS_SCHEMA]
+TOOL_ARG_KEYS = ["start_date", "end_date", "category", "min_amount", "group_by", "chart_type"]
+
+def extract_tool_call(content: str):
+    """
+    Finds a {"name": ..., "parameters": {...}} tool call written as text (fallback for stubborn models).
+    """
+    # Find the FIRST { and LAST } - more robust than regex for nested JSON
+    if '"name"' in content and '{' in content and '}' in content:
+        start_idx = content.find('{')
+        end_idx = content.rfind('}') + 1
+        json_str = content[start_idx:end_idx]
+        try:
+            loaded = json.loads(json_str)
+            if "name" in loaded:
+                return loaded
+        except Exception:
+            pass
+    return None
+
 class LocalAgent:
-    def __init__(self):
+    def __init__(self, speculative: dict = None, shared: "LocalAgent" = None, session_id: str = None,
+                 cascade: dict = None):
         self.model_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models", "Llama-3.2-3B-Instruct-Q4_K_M.gguf")
         self.llm = None
         self.messages = []
+        # Speculative decoding is opt-in per deployment (AGENT_SPECULATIVE=off|prompt_lookup|draft)
+        self.speculative = speculative or speculative_config_from_env()
+        self.draft_model = None
+        self.last_metrics = {}
+        # Session agents keep their own conversation but use the shared agent's model
+        self.shared = shared
+        self.session_id = session_id
+        self.scheduler = None
+        self.pool = None
+        # Two-tier cascade (AGENT_ROUTER_MODEL): a tiny model picks tools, the main model answers
+        self.cascade = cascade or cascade_config_from_env()
+        self.router = None
+        self.router_grammar = None
+        self._load_lock = threading.Lock()
+        self._llm_lock = threading.Lock()
+        self._router_lock = threading.Lock()
+        # One turn at a time per conversation: messages/last_metrics are per-agent state
+        self._chat_lock = threading.Lock()
         
-    def load_model(self):
+    def load_model(self, use_pool: bool = True):
+        if self.shared is not None:
+            if not self.shared.is_ready():
+                self.shared.load_model()
+            self.llm = self.shared.llm
+            self.draft_model = self.shared.draft_model
+            self.scheduler = self.shared.scheduler
+            self.pool = self.shared.pool
+            self.router = self.shared.router
+            self.router_grammar = self.shared.router_grammar
+            self._llm_lock = self.shared._llm_lock
+            self._router_lock = self.shared._router_lock
+            return
+
+        with self._load_lock:
+            if self.is_ready():
+                return
+            # AGENT_MODEL_WORKERS: inference runs in backend.model_server processes, not in this one
+            from backend.model_pool import ModelPool, worker_urls_from_env, wait_until_healthy
+            urls = worker_urls_from_env() if use_pool else []
+            if urls:
+                self.pool = ModelPool(urls)
+                if not wait_until_healthy(self.pool):
+                    print(f"⚠️ No model worker is healthy yet: {self.pool.stats()}")
+                print(f"Using model worker pool: {', '.join(urls)}")
+                return
+            self._load_model()
+
+    def is_ready(self) -> bool:
+        return self.llm is not None or self.pool is not None
+
+    def _load_model(self):
         if not os.path.exists(self.model_path):
             raise FileNotFoundError(f"Model not found at {self.model_path}. Please run download_model.py")
             
+        # Imported here so the web tier, CLI and tests don't pay for llama.cpp until a model is needed
+        from llama_cpp import Llama, LlamaGrammar
+
         print("Loading Model... (this may take a moment)")
-        # n_gpu_layers=0 for CPU only, increase if you have a GPU
-        # n_ctx=2048 context window
+        # Threads/batch/mmap come from the host profile (scripts/tune_cpu.py) and AGENT_* env overrides.
+        # n_gpu_layers defaults to 0 for CPU only, n_ctx to 4096
+        settings = load_inference_settings()
+        # Final answers mostly echo merchants/dates/amounts from tool messages,
+        # so prompt-lookup drafts are accepted often (see scripts/bench_speculative.py)
+        self.draft_model = build_draft_model(self.speculative, settings)
         self.llm = Llama(
             model_path=self.model_path,
-            n_gpu_layers=0, 
-            n_ctx=4096,
-            verbose=False
+            draft_model=self.draft_model,
+            verbose=False,
+            **settings
         )
-        print("Model Loaded.")
+        print(f"Model Loaded. (speculative decoding: {self.speculative['mode']}, settings: {settings})")
+
+        router_path = self.cascade["router_model_path"]
+        if router_path:
+            if not os.path.exists(router_path):
+                raise FileNotFoundError(f"Router model not found at {router_path}. Check AGENT_ROUTER_MODEL")
+            # Same mmap'd settings as the main model: weights stay in the shared page cache
+            self.router = Llama(model_path=router_path, verbose=False, **settings)
+            if self.cascade["grammar"]:
+                self.router_grammar = LlamaGrammar.from_string(build_tool_grammar(TOOLS_SCHEMA), verbose=False)
+            print(f"Router model loaded: {os.path.basename(router_path)} (grammar: {self.cascade['grammar']})")
+
+        # AGENT_MAX_SEQUENCES > 1: concurrent sessions share one batched llama context
+        from backend.scheduler import BatchScheduler, max_sequences_from_env
+        max_sequences = max_sequences_from_env()
+        if max_sequences > 1:
+            self.scheduler = BatchScheduler(self.llm, max_sequences=max_sequences, n_ctx_per_seq=settings["n_ctx"])
+            if self.draft_model:
+                print("Speculative decoding is not applied to batched requests.")
+            print(f"Continuous batching enabled: {max_sequences} sequences")
+
+    def create_chat_completion(self, messages, tools=None, tool_choice=None, session_id: str = None):
+        """
+        One completion on this agent's model, without the tool loop: through the worker pool,
+        the batch scheduler, or the local llama context. session_id keeps a conversation on the
+        same worker and lets the scheduler reuse its KV prefix.
+        """
+        if not self.is_ready():
+            self.load_model()
+
+        if self.pool:
+            return self.pool.create_chat_completion(
+                messages=messages, tools=tools, tool_choice=tool_choice, session_id=session_id
+            )
+
+        if self.scheduler:
+            return self.scheduler.create_chat_completion(
+                messages=messages, tools=tools, tool_choice=tool_choice, session_id=session_id
+            )
+
+        # A single llama context can only serve one completion at a time
+        with self._llm_lock:
+            if self.draft_model:
+                self.draft_model.start_completion()
+                proposed, accepted = self.draft_model.proposed, self.draft_model.accepted
+
+            response = self.llm.create_chat_completion(messages=messages, tools=tools, tool_choice=tool_choice)
+
+            if self.draft_model:
+                response.setdefault("usage", {}).update({
+                    "draft_tokens_proposed": self.draft_model.proposed - proposed,
+                    "draft_tokens_accepted": self.draft_model.accepted - accepted,
+                })
+        return response
+
+    def _complete(self):
+        """Runs one chat completion and accumulates decode metrics for the current turn."""
+        started = time.perf_counter()
+        response = self.create_chat_completion(
+            messages=self.messages,
+            tools=TOOLS_SCHEMA,
+            tool_choice="auto",
+            # The default agent's turns are serialized by _chat_lock, so it can own one cached slot too
+            session_id=self.session_id or "default"
+        )
+        usage = response.get("usage", {})
+        self.last_metrics["completion_seconds"] += time.perf_counter() - started
+        self.last_metrics["completion_tokens"] += usage.get("completion_tokens", 0)
+        self.last_metrics["draft_tokens_proposed"] += usage.get("draft_tokens_proposed", 0)
+        self.last_metrics["draft_tokens_accepted"] += usage.get("draft_tokens_accepted", 0)
+        return response
+
+    def _complete_router(self):
+        """Asks the tiny router model for the next tool call."""
+        with self._router_lock:
+            started = time.perf_counter()
+            response = self.router.create_chat_completion(
+                messages=self.messages + [{"role": "system", "content": ROUTER_HINT}],
+                tools=TOOLS_SCHEMA,
+                tool_choice="auto",
+                grammar=self.router_grammar,
+                max_tokens=ROUTER_MAX_TOKENS
+            )
+            self.last_metrics["router_seconds"] += time.perf_counter() - started
+            self.last_metrics["router_calls"] += 1
+        return response
+
+    def _next_response(self, executed_tools: set, debug_logs: list, step: int):
+        """
+        Cascade: the router proposes the next tool call; the main model is only used to write
+        the final answer, or when the router's output is not a usable, new tool call.
+        """
+        if not self.router:
+            return self._complete()
+
+        response = self._complete_router()
+        content = (response["choices"][0]["message"].get("content") or "").strip()
+        loaded = extract_tool_call(content)
+
+        args = (loaded.get("parameters") or loaded.get("arguments") or {}) if loaded else None
+        if loaded and loaded["name"] in TOOL_NAMES and isinstance(args, dict):
+            # Same signature the tool loop uses for deduplication
+            filtered_args = {k: v for k, v in args.items() if k in TOOL_ARG_KEYS}
+            call_sig = f"{loaded['name']}:{json.dumps(filtered_args, sort_keys=True)}"
+            if call_sig not in executed_tools:
+                self.last_metrics["router_tool_calls"] += 1
+                return response
+            reason = "Router repeated a tool call"
+        elif content.startswith(ANSWER_SENTINEL):
+            reason = "Router: ready to answer"
+        else:
+            reason = "Router output was not a valid tool call"
+
+        self.last_metrics["escalations"] += 1
+        debug_logs.append({
+            "step": step + 1,
+            "type": "thinking",
+            "content": "Escalating to main model",
+            "details": reason
+        })
+        return self._complete()
+
+    def _finish_metrics(self):
+        metrics = self.last_metrics
+        seconds = metrics["completion_seconds"]
+        metrics["tokens_per_sec"] = round(metrics["completion_tokens"] / seconds, 2) if seconds > 0 else 0.0
+        metrics["completion_seconds"] = round(seconds, 3)
+        if "router_seconds" in metrics:
+            metrics["router_seconds"] = round(metrics["router_seconds"], 3)
+        if self.draft_model and not self.scheduler and not self.pool:
+            proposed = metrics["draft_tokens_proposed"]
+            metrics["accepted_token_rate"] = round(metrics["draft_tokens_accepted"] / proposed, 3) if proposed else 0.0
+        return metrics
 
     def chat(self, user_query: str):
-        if not self.llm:
+        content, debug_logs, _ = self.chat_turn(user_query)
+        return content, debug_logs
+
+    def chat_turn(self, user_query: str):
+        """Like chat(), but also returns this turn's metrics (read under the same lock)."""
+        # /chat runs in the threadpool; requests without a session_id all share agent_instance
+        with self._chat_lock:
+            return self._chat_turn(user_query)
+
+    def _chat_turn(self, user_query: str):
+        if not self.is_ready():
             self.load_model()
-            
+
+        self.last_metrics = {
+            "speculative": self.speculative["mode"],
+            "completion_tokens": 0,
+            "completion_seconds": 0.0,
+            "draft_tokens_proposed": 0,
+            "draft_tokens_accepted": 0,
+        }
+        if self.scheduler:
+            self.last_metrics["speculative"] = "off"
+            self.last_metrics["batching"] = self.scheduler.stats()
+        if self.pool:
+            self.last_metrics["pool"] = self.pool.stats()
+        if self.router:
+            self.last_metrics.update({"router_calls": 0, "router_tool_calls": 0, "escalations": 0, "router_seconds": 0.0})
+
+        content, debug_logs = self._chat(user_query)
+
+        metrics = self._finish_metrics()
+        debug_logs.append({
+            "step": debug_logs[-1]["step"],
+            "type": "metrics",
+            "content": f"Completion: {metrics['tokens_per_sec']} tokens/sec incl. prompt eval ({metrics['speculative']})",
+            "details": json.dumps(metrics)
+        })
+        return content, debug_logs, dict(metrics)
+
+    def _chat(self, user_query: str):
         # Hardcode current date so the AI doesn't search in 2022
         today = "2026-02-01"
         
@@ -121,11 +372,7 @@ class LocalAgent:
             print(f"⚠️ Context optimized: Kept last 8 messages. Current len: {len(self.messages)}")
         
         for i in range(5):
-            response = self.llm.create_chat_completion(
-                messages=self.messages,
-                tools=TOOLS_SCHEMA,
-                tool_choice="auto"
-            )
+            response = self._next_response(executed_tools, debug_logs, i)
             
             choice = response["choices"][0]
             message = choice["message"]
@@ -138,26 +385,19 @@ class LocalAgent:
             
             # 2. Extract JSON from message content (fallback for stubborn models)
             if not tool_calls and content:
-                # Find the FIRST { and LAST } - more robust than regex for nested JSON
                 if '"name"' in content and '{' in content and '}' in content:
-                    start_idx = content.find('{')
-                    end_idx = content.rfind('}') + 1
-                    json_str = content[start_idx:end_idx]
-                    try:
-                        loaded = json.loads(json_str)
-                        if "name" in loaded:
-                            args = loaded.get("parameters") or loaded.get("arguments") or {}
-                            tool_calls = [{
-                                "id": f"call_manual_{i}",
-                                "function": {
-                                    "name": loaded["name"],
-                                    "arguments": json.dumps(args) if isinstance(args, dict) else str(args)
-                                }
-                            }]
-                            # Important: Replace content in the actual message dictionary
-                            message["content"] = "" 
-                    except Exception:
-                        pass
+                    loaded = extract_tool_call(content)
+                    if loaded:
+                        args = loaded.get("parameters") or loaded.get("arguments") or {}
+                        tool_calls = [{
+                            "id": f"call_manual_{i}",
+                            "function": {
+                                "name": loaded["name"],
+                                "arguments": json.dumps(args) if isinstance(args, dict) else str(args)
+                            }
+                        }]
+                        # Important: Replace content in the actual message dictionary
+                        message["content"] = "" 
                 
                 # 3. Nudge if the model is talking about tools but didn't output valid JSON
                 elif any(tool["function"]["name"] in content for tool in TOOLS_SCHEMA):
@@ -210,8 +450,7 @@ class LocalAgent:
                     args = {}
                 
                 # Sanitize
-                valid_keys = ["start_date", "end_date", "category", "min_amount", "group_by", "chart_type"]
-                filtered_args = {k: v for k, v in args.items() if k in valid_keys}
+                filtered_args = {k: v for k, v in args.items() if k in TOOL_ARG_KEYS}
                 
                 # Create a signature for deduplication
                 call_sig = f"{func_name}:{json.dumps(filtered_args, sort_keys=True)}"
@@ -272,3 +511,20 @@ class LocalAgent:
 
 # Global Instance
 agent_instance = LocalAgent()
+
+# Per-session conversations, all sharing agent_instance's model.
+# Every page load starts a new session, so keep only the most recently used ones.
+MAX_SESSIONS = int(os.environ.get("AGENT_MAX_SESSIONS", "1000"))
+_sessions = OrderedDict()
+_sessions_lock = threading.Lock()
+
+def get_session_agent(session_id: str = None) -> LocalAgent:
+    if not session_id:
+        return agent_instance
+    with _sessions_lock:
+        if session_id not in _sessions:
+            _sessions[session_id] = LocalAgent(speculative=agent_instance.speculative, shared=agent_instance, session_id=session_id)
+        _sessions.move_to_end(session_id)
+        while len(_sessions) > MAX_SESSIONS:
+            _sessions.popitem(last=False)
+        return _sessions[session_id]
@@ -0,0 +1,205 @@
+"""
+Offline batch analysis: runs a fixed report (tool calls and/or agent questions) over
+many customers' statements with a process pool, one model per worker process.
+
+Each sub-directory of the input directory is one customer (all its statements are merged);
+statements directly in the input directory are one customer each.
+"""
+import os
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+STATEMENT_EXTENSIONS = (".pdf", ".csv")
+
+DEFAULT_SPEC = {
+    "tools": [
+        {"name": "summarize_spending", "parameters": {"group_by": "category"}},
+        {"name": "summarize_spending", "parameters": {"group_by": "month"}},
+    ],
+    "questions": [],
+}
+
+# Per-process state, set up by _init_worker
+_worker = {}
+
+
+def load_spec(path: str = None, questions: list = None) -> dict:
+    """Report spec: {"tools": [{"name": ..., "parameters": {...}}], "questions": ["..."]}"""
+    if path:
+        with open(path, encoding="utf-8") as f:
+            spec = json.load(f)
+    else:
+        spec = dict(DEFAULT_SPEC)
+    spec = {"tools": spec.get("tools", []), "questions": list(spec.get("questions", []))}
+    spec["questions"] += questions or []
+    return spec
+
+
+def discover_customers(input_dir: str) -> list:
+    """Returns [(customer_id, [statement paths])] sorted by customer id."""
+    customers = []
+    for entry in sorted(os.listdir(input_dir)):
+        path = os.path.join(input_dir, entry)
+        if os.path.isdir(path):
+            files = sorted(
+                os.path.join(path, name) for name in os.listdir(path)
+                if name.lower().endswith(STATEMENT_EXTENSIONS)
+            )
+            if files:
+                customers.append((entry, files))
+        elif entry.lower().endswith(STATEMENT_EXTENSIONS):
+            customers.append((os.path.splitext(entry)[0], [path]))
+    return customers
+
+
+def read_results(output_path: str) -> list:
+    """Records in the JSONL output, skipping the partial line an interrupted run can leave."""
+    records = []
+    if not os.path.exists(output_path):
+        return records
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue  # partial last line from an interrupted run
+    return records
+
+
+def completed_customers(output_path: str) -> set:
+    """Customer ids already written to the JSONL output (the output doubles as the checkpoint)."""
+    return {record["customer_id"] for record in read_results(output_path) if "error" not in record}
+
+
+def _init_worker(spec: dict, password: str, workers: int, charts_dir: str, charts_link: str):
+    from backend.tuning import split_threads
+    from backend.mcp_server import set_charts_dir
+    split_threads(os.environ, workers)
+    # Keep batch charts out of the web app's frontend/charts
+    set_charts_dir(charts_dir, charts_link)
+
+    _worker["spec"] = spec
+    _worker["password"] = password
+    _worker["agent"] = None
+    if spec["questions"]:
+        from backend.agent import LocalAgent
+        agent = LocalAgent()
+        agent.load_model()
+        _worker["agent"] = agent
+
+
+def _analyze_customer(customer_id: str, files: list) -> dict:
+    import pandas as pd
+    from backend.data_ingestion import load_statement, categorize_merchant
+    from backend.mcp_server import set_dataframe, read_transactions, summarize_spending, generate_spending_chart
+
+    tools = {
+        "read_transactions": read_transactions,
+        "summarize_spending": summarize_spending,
+        "generate_spending_chart": generate_spending_chart,
+    }
+    started = time.perf_counter()
+    record = {"customer_id": customer_id, "files": [os.path.basename(f) for f in files]}
+
+    try:
+        dfs = [load_statement(path, _worker["password"]) for path in files]
+        dfs = [df for df in dfs if not df.empty]
+        if not dfs:
+            raise ValueError("Could not parse any statements")
+        df = pd.concat(dfs, ignore_index=True)
+        if 'category' not in df.columns:
+            df['category'] = df['description'].apply(categorize_merchant)
+        set_dataframe(df)
+        record["rows"] = len(df)
+
+        record["tools"] = []
+        for call in _worker["spec"]["tools"]:
+            func = tools.get(call["name"])
+            result = func(**call.get("parameters", {})) if func else f"Error: Tool {call['name']} not found"
+            record["tools"].append({"name": call["name"], "parameters": call.get("parameters", {}), "result": result})
+
+        record["answers"] = []
+        agent = _worker["agent"]
+        completion_tokens = 0
+        for question in _worker["spec"]["questions"]:
+            agent.messages = []  # every question starts from a clean conversation
+            answer, _ = agent.chat(question)
+            completion_tokens += agent.last_metrics.get("completion_tokens", 0)
+            record["answers"].append({"question": question, "answer": answer})
+        record["completion_tokens"] = completion_tokens
+    except Exception as e:
+        record["error"] = str(e)
+
+    record["seconds"] = round(time.perf_counter() - started, 3)
+    return record
+
+
+def default_charts_dir(output_path: str) -> str:
+    """batch_results.jsonl -> batch_results_charts/ next to it."""
+    return os.path.splitext(os.path.abspath(output_path))[0] + "_charts"
+
+
+def run_batch(input_dir: str, output_path: str, spec: dict, workers: int = 2, password: str = None,
+              resume: bool = True, charts_dir: str = None) -> dict:
+    """
+    Streams one JSON line per customer to output_path as results complete.
+    With resume, customers already in the output are skipped.
+    Charts go to charts_dir (default: <output>_charts/) and are linked relative to output_path.
+    """
+    customers = discover_customers(input_dir)
+    done = completed_customers(output_path) if resume else set()
+    pending = [(cid, files) for cid, files in customers if cid not in done]
+    print(f"{len(customers)} customers found, {len(customers) - len(pending)} already done, {len(pending)} to run "
+          f"on {workers} workers ({len(spec['tools'])} tool calls, {len(spec['questions'])} questions each)")
+
+    charts_dir = os.path.abspath(charts_dir or default_charts_dir(output_path))
+    charts_link = os.path.relpath(charts_dir, os.path.dirname(os.path.abspath(output_path))).replace(os.sep, "/")
+
+    stats = {"customers": 0, "errors": 0, "files": 0, "completion_tokens": 0, "charts_dir": charts_dir}
+    started = time.perf_counter()
+
+    mode = "a" if resume else "w"
+    with open(output_path, mode, encoding="utf-8") as out, ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(spec, password, workers, charts_dir, charts_link)
+    ) as executor:
+        # Terminate a partial line left by an interrupted run so new records start cleanly
+        if resume and out.tell() > 0:
+            with open(output_path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    out.write("\n")
+        futures = [executor.submit(_analyze_customer, cid, files) for cid, files in pending]
+        for future in as_completed(futures):
+            record = future.result()
+            out.write(json.dumps(record, default=str) + "\n")
+            out.flush()
+
+            stats["customers"] += 1
+            stats["files"] += len(record["files"])
+            stats["errors"] += "error" in record
+            stats["completion_tokens"] += record.get("completion_tokens", 0)
+            if stats["customers"] % 10 == 0 or stats["customers"] == len(pending):
+                elapsed = time.perf_counter() - started
+                print(f"  {stats['customers']}/{len(pending)} customers, "
+                      f"{stats['customers'] / elapsed:.2f} customers/sec, {stats['errors']} errors")
+
+    elapsed = time.perf_counter() - started
+    stats["seconds"] = round(elapsed, 2)
+    stats["customers_per_sec"] = round(stats["customers"] / elapsed, 3) if elapsed else 0.0
+    stats["files_per_sec"] = round(stats["files"] / elapsed, 3) if elapsed else 0.0
+    stats["tokens_per_sec"] = round(stats["completion_tokens"] / elapsed, 2) if elapsed else 0.0
+    return stats
+
+
+def jsonl_to_parquet(jsonl_path: str, parquet_path: str):
+    """Flattens the JSONL results into a Parquet file (needs pyarrow or fastparquet)."""
+    import pandas as pd
+
+    df = pd.DataFrame.from_records(read_results(jsonl_path))
+    # Resumed runs append retries of failed customers; keep the latest attempt
+    df = df.drop_duplicates(subset="customer_id", keep="last")
+    for column in ("tools", "answers", "files"):
+        if column in df.columns:
+            df[column] = df[column].apply(json.dumps)
+    df.to_parquet(parquet_path, index=False)
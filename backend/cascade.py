@@ -0,0 +1,39 @@
+import os
+
+# Router calls only need to emit a short tool call; anything longer is an answer and gets escalated
+ROUTER_MAX_TOKENS = 128
+
+# Sentinel the grammar-constrained router emits when no tool is needed
+ANSWER_SENTINEL = "ANSWER"
+
+ROUTER_HINT = (
+    "Reply with ONLY the JSON tool call for the next step. "
+    f"If no tool is needed to answer the user, reply with {ANSWER_SENTINEL}."
+)
+
+
+def cascade_config_from_env() -> dict:
+    """
+    AGENT_ROUTER_MODEL=models/Llama-3.2-1B-Instruct-Q4_K_M.gguf enables the two-tier cascade:
+    the tiny model picks tools, the main model writes final answers.
+    AGENT_ROUTER_GRAMMAR=1 constrains the tiny model to a tool call or ANSWER.
+    """
+    return {
+        "router_model_path": os.environ.get("AGENT_ROUTER_MODEL"),
+        "grammar": os.environ.get("AGENT_ROUTER_GRAMMAR", "1").strip().lower() in ("1", "true", "yes"),
+    }
+
+
+def build_tool_grammar(tools_schema: list) -> str:
+    """GBNF accepting either {"name": <known tool>, "parameters": {...}} or the ANSWER sentinel."""
+    names = " | ".join(f'"\\"{tool["function"]["name"]}\\""' for tool in tools_schema)
+    return f'''root ::= call | "{ANSWER_SENTINEL}"
+call ::= "{{" ws "\\"name\\":" ws name "," ws "\\"parameters\\":" ws object ws "}}"
+name ::= {names}
+object ::= "{{" ws ( pair ( "," ws pair )* )? ws "}}"
+pair ::= string ":" ws value
+value ::= string | number
+string ::= "\\"" [^"\\\\]* "\\""
+number ::= "-"? [0-9]+ ( "." [0-9]+ )?
+ws ::= [ \\t\\n]*
+'''
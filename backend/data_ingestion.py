@@ -1,7 +1,11 @@
-import pandas as pd
-import dateutil.parser
-import pypdf
+from __future__ import annotations
 import re
+from typing import TYPE_CHECKING
+
+# pandas, pypdf and dateutil are imported inside the functions that use them,
+# so importing this module (web tier, CLI, tests) stays cheap
+if TYPE_CHECKING:
+    import pandas as pd
 
 def categorize_merchant(description: str) -> str:
     """
@@ -32,6 +36,10 @@ def parse_pdf(filepath: str, password: str = None) -> pd.DataFrame:
     Parses a PDF file attempting to extract transactions.
     Strategy: pattern match lines that start with a date.
     """
+    import pandas as pd
+    import pypdf
+    import dateutil.parser
+
     transactions = []
     
     # Relaxed Regex Patterns
@@ -136,6 +144,9 @@ def load_statement(filepath: str, password: str = None) -> pd.DataFrame:
     if filepath.endswith('.pdf'):
         return parse_pdf(filepath, password)
     else:
+        import pandas as pd
+        import dateutil.parser
+
         try:
             df = pd.read_csv(filepath)
             
@@ -179,6 +190,8 @@ def query_transactions(df: pd.DataFrame, start_date: str = None, end_date: str =
     """
     Filters transactions based on criteria.
     """
+    import pandas as pd
+
     if df.empty:
         return []
         
@@ -210,6 +223,8 @@ def get_spending_summary(df: pd.DataFrame, group_by: str = 'category'):
     """
     Summarizes spending by category or month.
     """
+    import pandas as pd
+
     if df.empty:
         return {}
         
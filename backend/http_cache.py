@@ -0,0 +1,104 @@
+import os
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.responses import FileResponse
+from starlette.staticfiles import StaticFiles, NotModifiedResponse
+
+# Chart files are named after a hash of their PNG bytes (see generate_spending_chart),
+# so a given URL never changes content and can be cached forever
+HASHED_CHART = re.compile(r"(^|/)charts/chart_[0-9a-f]{16}\.png$")
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+# Already compressed formats: compressing them again only costs CPU
+INCOMPRESSIBLE_SUFFIXES = (".png", ".jpg", ".jpeg", ".gif", ".webp", ".woff", ".woff2", ".gz", ".br")
+
+# (path, mtime, size) -> ETag, least recently used evicted first
+MAX_ETAG_CACHE = 1024
+_etag_cache = OrderedDict()
+_etag_lock = threading.Lock()
+
+
+def cache_control_for(path: str) -> str:
+    return IMMUTABLE if HASHED_CHART.search(path.replace(os.sep, "/")) else REVALIDATE
+
+
+def content_etag(full_path: str, stat_result: os.stat_result) -> str:
+    """Strong ETag from the file's bytes, cached until the file's mtime or size changes."""
+    key = (str(full_path), stat_result.st_mtime_ns, stat_result.st_size)
+    with _etag_lock:
+        etag = _etag_cache.get(key)
+        if etag is not None:
+            _etag_cache.move_to_end(key)
+            return etag
+
+    digest = hashlib.sha256()
+    with open(full_path, "rb") as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            digest.update(chunk)
+    etag = f'"{digest.hexdigest()[:32]}"'
+
+    with _etag_lock:
+        _etag_cache[key] = etag
+        while len(_etag_cache) > MAX_ETAG_CACHE:
+            _etag_cache.popitem(last=False)
+    return etag
+
+
+class CachedStaticFiles(StaticFiles):
+    """
+    StaticFiles with content-hash ETags (Starlette's default is derived from mtime/size)
+    and Cache-Control: immutable for hashed charts, revalidate-with-ETag for everything else.
+    """
+
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        response = FileResponse(full_path, status_code=status_code, stat_result=stat_result)
+        response.headers["etag"] = content_etag(full_path, stat_result)
+        response.headers["cache-control"] = cache_control_for(str(full_path))
+
+        if self.is_not_modified(response.headers, Headers(scope=scope)):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+class CompressionMiddleware:
+    """
+    Brotli (when the optional brotli-asgi package is installed, with gzip fallback) or gzip
+    for text responses; images and other compressed formats pass through untouched.
+
+    A strong ETag names one exact byte sequence, so it is weakened (W/"...") on compressed
+    bodies. Starlette ignores the W/ prefix when matching If-None-Match, so revalidation
+    still gets a 304; the 304 echoes the weak form the client holds.
+    """
+
+    def __init__(self, app, minimum_size: int = 500):
+        self.app = app
+        try:
+            from brotli_asgi import BrotliMiddleware
+            self.compressed = BrotliMiddleware(app, minimum_size=minimum_size, gzip_fallback=True)
+        except ImportError:
+            self.compressed = GZipMiddleware(app, minimum_size=minimum_size)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].lower().endswith(INCOMPRESSIBLE_SUFFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        if_none_match = Headers(scope=scope).get("if-none-match", "")
+
+        async def send_with_etag(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                etag = headers.get("etag")
+                if etag and not etag.startswith("W/"):
+                    compressed = "content-encoding" in headers
+                    weak_match = message["status"] == 304 and f"W/{etag}" in if_none_match
+                    if compressed or weak_match:
+                        headers["etag"] = f"W/{etag}"
+            await send(message)
+
+        await self.compressed(scope, receive, send_with_etag)
@@ -1,20 +1,42 @@
-from typing import List
+from typing import List, Literal, Optional
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException
 from pydantic import BaseModel
 from backend.data_ingestion import load_statement, categorize_merchant
-from backend.mcp_server import set_dataframe
-from backend.agent import agent_instance
+from backend.mcp_server import set_dataframe, prewarm_charts
+from backend.agent import get_session_agent
+from backend.http_cache import CachedStaticFiles, CompressionMiddleware
 import os
-import pandas as pd
+import threading
+from contextlib import asynccontextmanager
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # pandas/matplotlib are imported lazily; load them off the request path
+    threading.Thread(target=prewarm_charts, name="prewarm", daemon=True).start()
+    yield
+
+app = FastAPI(lifespan=lifespan)
+# Compresses JSON/HTML/CSS/JS responses; charts are PNGs and pass through
+app.add_middleware(CompressionMiddleware, minimum_size=500)
 
 class ChatRequest(BaseModel):
     message: str
+    session_id: Optional[str] = None
+    # Debug log verbosity: "off" keeps normal responses small, "summary" drops tool output, "full" is everything
+    debug: Literal["off", "summary", "full"] = "off"
+
+def filter_debug_logs(debug_logs: list, level: str):
+    if level == "full":
+        return debug_logs
+    if level == "summary":
+        return [{k: v for k, v in log.items() if k != "details"} for log in debug_logs]
+    return None
 
 
 @app.post("/upload")
 async def upload_files(files: List[UploadFile] = File(...), password: str = Form(None)):
+    import pandas as pd
+
     try:
         all_dfs = []
         
@@ -70,11 +92,17 @@ async def upload_files(files: List[UploadFile] = File(...), password: str = Form
         print(f"Upload error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Server error: {str(e)}")
 
+# Plain def: FastAPI runs it in the threadpool, so concurrent sessions can share the batched model
 @app.post("/chat")
-async def chat(request: ChatRequest):
+def chat(request: ChatRequest):
     try:
-        response, debug_logs = agent_instance.chat(request.message)
-        return {"response": response, "debug_logs": debug_logs}
+        agent = get_session_agent(request.session_id)
+        response, debug_logs, metrics = agent.chat_turn(request.message)
+        result = {"response": response, "metrics": metrics}
+        debug_logs = filter_debug_logs(debug_logs, request.debug)
+        if debug_logs is not None:
+            result["debug_logs"] = debug_logs
+        return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -83,5 +111,4 @@ async def chat(request: ChatRequest):
 def health_check():
     return {"status": "running"}
 
-from fastapi.staticfiles import StaticFiles
-app.mount("/", StaticFiles(directory="frontend", html=True), name="static")
+app.mount("/", CachedStaticFiles(directory="frontend", html=True), name="static")
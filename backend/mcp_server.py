@@ -1,20 +1,29 @@
-from mcp.server.fastmcp import FastMCP
 from backend.data_ingestion import load_statement, query_transactions, get_spending_summary
-import pandas as pd
 import os
 
-# Initialize FastMCP Server
-mcp = FastMCP("CreditCardAgent")
-
 # Global state to hold the current dataframe
 # In a real app, this might be session-scoped or in a DB
-current_df = pd.DataFrame()
+# (None until a statement is uploaded, so importing this module doesn't need pandas)
+current_df = None
+
+# Where generate_spending_chart writes PNGs and how its markdown links to them.
+# The web app serves frontend/ statically; offline runs (backend/batch.py) point this elsewhere.
+charts_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "frontend", "charts")
+charts_url = "/charts"
 
-def set_dataframe(df: pd.DataFrame):
+def set_charts_dir(path: str, url: str):
+    """Writes charts to `path` and links them as `url`/<file> (a URL or a path relative to the results)."""
+    global charts_dir, charts_url
+    charts_dir = path
+    charts_url = url
+
+def set_dataframe(df):
     global current_df
     current_df = df
 
-@mcp.tool()
+def _no_statement() -> bool:
+    return current_df is None or current_df.empty
+
 def read_transactions(start_date: str = None, end_date: str = None, category: str = None, min_amount: float = None) -> str:
     """
     Search for transactions in the credit card statement based on filters.
@@ -26,7 +35,7 @@ def read_transactions(start_date: str = None, end_date: str = None, category: st
         min_amount (float): Minimum transaction amount
     """
     global current_df
-    if current_df.empty:
+    if _no_statement():
         return "No statement loaded. Please upload a statement first."
         
     # Cast min_amount to float to avoid pandas errors if the LLM sent a string
@@ -39,7 +48,6 @@ def read_transactions(start_date: str = None, end_date: str = None, category: st
     results = query_transactions(current_df, start_date, end_date, category, min_amount)
     return str(results)
 
-@mcp.tool()
 def summarize_spending(group_by: str = "category") -> str:
     """
     Get a summary of spending grouped by 'category' or 'month'.
@@ -48,13 +56,12 @@ def summarize_spending(group_by: str = "category") -> str:
         group_by (str): 'category' or 'month'
     """
     global current_df
-    if current_df.empty:
+    if _no_statement():
         return "No statement loaded."
         
     summary = get_spending_summary(current_df, group_by)
     return str(summary)
 
-@mcp.tool()
 def generate_spending_chart(group_by: str = "category", chart_type: str = "bar") -> str:
     """
     Generate a chart of spending and return the image URL.
@@ -64,12 +71,14 @@ def generate_spending_chart(group_by: str = "category", chart_type: str = "bar")
         chart_type (str): 'bar' or 'pie'
     """
     global current_df
-    import matplotlib
-    matplotlib.use('Agg') # Non-interactive backend
-    import matplotlib.pyplot as plt
-    import uuid
+    # Object API, not pyplot: pyplot's current figure is process-global and
+    # concurrent sessions would draw into each other's charts
+    from matplotlib.figure import Figure
+    import io
+    import hashlib
+    import tempfile
     
-    if current_df.empty:
+    if _no_statement():
         return "No statement loaded."
 
     try:
@@ -89,38 +98,88 @@ def generate_spending_chart(group_by: str = "category", chart_type: str = "bar")
         labels = list(chart_data.keys())
         values = list(chart_data.values())
         
-        plt.figure(figsize=(10, 6))
+        fig = Figure(figsize=(10, 6))
+        ax = fig.subplots()
         
         if chart_type == "pie":
-            plt.pie(values, labels=labels, autopct='%1.1f%%', startangle=140)
-            plt.title(f"Spending by {group_by.capitalize()}")
+            ax.pie(values, labels=labels, autopct='%1.1f%%', startangle=140)
+            ax.set_title(f"Spending by {group_by.capitalize()}")
         else:
-            plt.bar(labels, values, color='skyblue')
-            plt.xlabel(group_by.capitalize())
-            plt.ylabel("Amount (₹)")
-            plt.title(f"Spending by {group_by.capitalize()}")
-            plt.xticks(rotation=45, ha='right')
-            plt.tight_layout()
+            ax.bar(labels, values, color='skyblue')
+            ax.set_xlabel(group_by.capitalize())
+            ax.set_ylabel("Amount (₹)")
+            ax.set_title(f"Spending by {group_by.capitalize()}")
+            for label in ax.get_xticklabels():
+                label.set_rotation(45)
+                label.set_ha('right')
+            fig.tight_layout()
             
-        # Save to frontend/charts
-        filename = f"chart_{uuid.uuid4().hex[:8]}.png"
-        charts_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "frontend", "charts")
+        # Render in memory and name the file after its content hash:
+        # the URL is immutable (cached forever by browsers) and identical charts are stored once
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format='png')
+        png = buffer.getvalue()
+
+        # Save to frontend/charts (or the configured charts_dir)
+        filename = f"chart_{hashlib.sha256(png).hexdigest()[:16]}.png"
         os.makedirs(charts_dir, exist_ok=True)
         filepath = os.path.join(charts_dir, filename)
         
-        plt.savefig(filepath)
-        plt.close()
+        if not os.path.exists(filepath):
+            # Write to a temp file and rename it into place, so a concurrent request for the
+            # same chart never serves a half-written (and then cached-forever) PNG
+            fd, tmp_path = tempfile.mkstemp(dir=charts_dir, prefix=".chart_", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(png)
+                os.replace(tmp_path, filepath)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
         
-        return f"![Spending Chart](/charts/{filename})"
+        return f"![Spending Chart]({charts_url}/{filename})"
     except Exception as e:
         return f"Error generating chart: {str(e)}"
 
-@mcp.resource("statement://current")
 def get_current_statement() -> str:
     """
     Get the full current statement as CSV text.
     """
     global current_df
-    if current_df.empty:
+    if _no_statement():
         return "Empty"
     return current_df.to_csv(index=False)
+
+def prewarm_charts():
+    """
+    Imports matplotlib (and pandas) ahead of the first chart request.
+    main.py runs this in a background thread at startup.
+    """
+    import pandas
+    import matplotlib.figure
+    import matplotlib.backends.backend_agg
+
+def create_mcp_server():
+    """
+    Builds the FastMCP server exposing the tools above. The web app calls the tools directly,
+    so the MCP stack is only imported when this server is actually used.
+    """
+    from mcp.server.fastmcp import FastMCP
+
+    server = FastMCP("CreditCardAgent")
+    server.tool()(read_transactions)
+    server.tool()(summarize_spending)
+    server.tool()(generate_spending_chart)
+    server.resource("statement://current")(get_current_statement)
+    return server
+
+_mcp = None
+
+def __getattr__(name):
+    # Keeps `from backend.mcp_server import mcp` working with the lazy server
+    global _mcp
+    if name == "mcp":
+        if _mcp is None:
+            _mcp = create_mcp_server()
+        return _mcp
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
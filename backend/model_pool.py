@@ -0,0 +1,134 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+import requests
+
+
+def worker_urls_from_env() -> list:
+    """AGENT_MODEL_WORKERS=http://127.0.0.1:9001,http://127.0.0.1:9002 routes inference to model workers."""
+    value = os.environ.get("AGENT_MODEL_WORKERS", "")
+    return [url.strip().rstrip("/") for url in value.split(",") if url.strip()]
+
+
+class _Worker:
+    def __init__(self, url: str):
+        self.url = url
+        self.healthy = False
+        self.in_flight = 0          # requests this process has outstanding on the worker
+        self.reported_in_flight = 0  # from the worker's /health (includes other web processes)
+        self.last_error = None
+
+
+class ModelPool:
+    """
+    Client-side load balancer over backend.model_server workers.
+
+    - Health checks: a background thread polls each worker's /health.
+    - Routing: a session sticks to the worker that served it last (its KV prefix is warm there);
+      new sessions, or sessions whose worker is down, go to the least-loaded healthy worker.
+    - Failover: connection errors mark the worker down and the request is retried elsewhere.
+    """
+
+    def __init__(self, urls: list, health_interval: float = 5.0, timeout: float = None, max_sessions: int = 10000):
+        if not urls:
+            raise ValueError("ModelPool needs at least one worker URL")
+        self.workers = [_Worker(url) for url in urls]
+        self.health_interval = health_interval
+        self.timeout = timeout or float(os.environ.get("AGENT_WORKER_TIMEOUT", "300"))
+        self.max_sessions = max_sessions
+        self._affinity = OrderedDict()
+        self._lock = threading.Lock()
+        self._http = requests.Session()
+
+        self.check_health()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._health_loop, name="model-pool-health", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._stopped.set()
+
+    def check_health(self):
+        for worker in self.workers:
+            try:
+                r = self._http.get(f"{worker.url}/health", timeout=2)
+                data = r.json()
+                worker.healthy = r.ok and data.get("status") == "ok"
+                worker.reported_in_flight = data.get("in_flight", 0)
+                worker.last_error = None if worker.healthy else data.get("status")
+            except Exception as e:
+                worker.healthy = False
+                worker.last_error = str(e)
+
+    def _health_loop(self):
+        while not self._stopped.wait(self.health_interval):
+            self.check_health()
+
+    def _pick(self, session_id: str = None, exclude=()) -> _Worker:
+        with self._lock:
+            if session_id and session_id in self._affinity:
+                worker = self._affinity[session_id]
+                if worker.healthy and worker not in exclude:
+                    self._affinity.move_to_end(session_id)
+                    return worker
+
+            candidates = [w for w in self.workers if w.healthy and w not in exclude]
+            if not candidates:
+                raise RuntimeError("No healthy model workers available: " + ", ".join(
+                    f"{w.url} ({w.last_error})" for w in self.workers
+                ))
+            worker = min(candidates, key=lambda w: (w.in_flight, w.reported_in_flight))
+
+            if session_id:
+                self._affinity[session_id] = worker
+                self._affinity.move_to_end(session_id)
+                while len(self._affinity) > self.max_sessions:
+                    self._affinity.popitem(last=False)
+            return worker
+
+    def create_chat_completion(self, messages, tools=None, tool_choice=None, session_id: str = None):
+        tried = []
+        while True:
+            worker = self._pick(session_id, exclude=tried)
+            with self._lock:
+                worker.in_flight += 1
+            try:
+                r = self._http.post(
+                    f"{worker.url}/v1/chat/completions",
+                    json={"messages": messages, "tools": tools, "tool_choice": tool_choice, "session_id": session_id},
+                    timeout=self.timeout,
+                )
+            except requests.ConnectionError as e:
+                # Worker died or is restarting: take it out of rotation and try another
+                worker.healthy = False
+                worker.last_error = str(e)
+                tried.append(worker)
+                continue
+            finally:
+                with self._lock:
+                    worker.in_flight -= 1
+
+            if not r.ok:
+                raise RuntimeError(f"Model worker {worker.url} failed: {r.text}")
+            return r.json()
+
+    def stats(self) -> dict:
+        return {
+            "workers": [
+                {"url": w.url, "healthy": w.healthy, "in_flight": w.in_flight, "reported_in_flight": w.reported_in_flight}
+                for w in self.workers
+            ],
+            "sessions": len(self._affinity),
+        }
+
+
+def wait_until_healthy(pool: ModelPool, timeout: float = 300.0) -> bool:
+    """Blocks until at least one worker is up (workers take a while to load the model)."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        pool.check_health()
+        if any(w.healthy for w in pool.workers):
+            return True
+        time.sleep(1)
+    return False
@@ -0,0 +1,90 @@
+"""
+Standalone model worker. Holds one model copy and serves chat completions over HTTP,
+so inference can scale (and crash) independently of the web tier.
+
+Run one per port (scripts/run_model_pool.py starts several):
+    python -m backend.model_server --port 9001
+"""
+import argparse
+import os
+import threading
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel
+
+from backend.agent import LocalAgent
+
+# Workers only serve completions: the cascade router runs in the web tier's tool loop, so don't load it here
+agent = LocalAgent(cascade={"router_model_path": None, "grammar": False})
+
+_stats_lock = threading.Lock()
+_stats = {"in_flight": 0, "served": 0, "errors": 0}
+
+
+class CompletionRequest(BaseModel):
+    messages: List[Dict[str, Any]]
+    tools: Optional[List[Dict[str, Any]]] = None
+    tool_choice: Optional[Any] = None
+    session_id: Optional[str] = None
+
+
+def _enable_prompt_cache():
+    # Session affinity sends a conversation back to the same worker; the RAM cache keeps
+    # several sessions' KV prefixes around instead of only the most recent prompt.
+    # (With AGENT_MAX_SEQUENCES > 1 the scheduler keeps per-session KV itself.)
+    cache_mb = int(os.environ.get("AGENT_KV_CACHE_MB", "512"))
+    if cache_mb > 0 and agent.llm is not None and not agent.scheduler:
+        from llama_cpp import LlamaRAMCache
+        agent.llm.set_cache(LlamaRAMCache(capacity_bytes=cache_mb * 1024 * 1024))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # A worker always serves its own model, even if it inherited the web tier's AGENT_MODEL_WORKERS
+    agent.load_model(use_pool=False)
+    _enable_prompt_cache()
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+@app.get("/health")
+def health():
+    with _stats_lock:
+        return {"status": "ok" if agent.llm is not None else "loading", "pid": os.getpid(), **_stats}
+
+
+# Plain def: runs in the threadpool so /health stays responsive during generation
+@app.post("/v1/chat/completions")
+def chat_completions(request: CompletionRequest):
+    with _stats_lock:
+        _stats["in_flight"] += 1
+    try:
+        response = agent.create_chat_completion(
+            messages=request.messages, tools=request.tools, tool_choice=request.tool_choice,
+            session_id=request.session_id
+        )
+        with _stats_lock:
+            _stats["served"] += 1
+        return response
+    except Exception as e:
+        with _stats_lock:
+            _stats["errors"] += 1
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        with _stats_lock:
+            _stats["in_flight"] -= 1
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Run a model worker")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9001)
+    args = parser.parse_args()
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
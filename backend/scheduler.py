@@ -0,0 +1,322 @@
+import os
+import queue
+import threading
+from collections import OrderedDict
+import numpy as np
+
+
+def max_sequences_from_env() -> int:
+    """AGENT_MAX_SEQUENCES > 1 enables continuous batching with that many concurrent sequences."""
+    return max(1, int(os.environ.get("AGENT_MAX_SEQUENCES", "1")))
+
+
+class _Sequence:
+    """One in-flight generation request occupying a llama.cpp sequence id."""
+
+    def __init__(self, prompt_tokens, max_tokens, stop, sampling, session_id=None):
+        self.prompt_tokens = prompt_tokens
+        self.session_id = session_id
+        self.pending = list(prompt_tokens)  # tokens not yet in the KV cache
+        self.n_past = 0
+        self.output = []
+        self.max_tokens = max_tokens
+        self.stop = stop or []
+        self.sampling = sampling
+        self.seq_id = None
+        self.reused = 0
+        self.text = ""
+        self.finish_reason = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class BatchScheduler:
+    """
+    Continuous batching over a single model copy.
+
+    Every iteration packs one decode token for each running sequence, plus prompt chunks
+    of newly admitted sequences, into one llama_decode call over a shared KV cache.
+    New requests are admitted between iterations and sequences are freed as soon as they
+    finish, so aggregate tokens/sec grows with the number of concurrent users.
+
+    A finished sequence that belongs to a session keeps its KV cache while the slot is idle.
+    The session's next call (the agent loop re-sends the whole conversation every step)
+    only prefills the tokens after the longest common prefix. Idle slots are reclaimed
+    least recently used first when a new request needs one.
+    """
+
+    def __init__(self, llm, max_sequences: int = 4, n_ctx_per_seq: int = 4096):
+        import llama_cpp
+        from llama_cpp._internals import LlamaContext, LlamaBatch
+
+        self.llm = llm
+        self.max_sequences = max_sequences
+        self.n_ctx_per_seq = n_ctx_per_seq
+        self.n_batch = llm.n_batch
+        self.n_vocab = llm.n_vocab()
+        self._llama_cpp = llama_cpp
+
+        # Second context on the same weights: the KV cache is sized for all sequences,
+        # the model itself is not copied.
+        params = llama_cpp.llama_context_params.from_buffer_copy(llm.context_params)
+        params.n_ctx = n_ctx_per_seq * max_sequences
+        params.n_seq_max = max_sequences
+        params.logits_all = False
+        self.ctx = LlamaContext(model=llm._model, params=params, verbose=False)
+        self.batch = LlamaBatch(n_tokens=self.n_batch, embd=0, n_seq_max=max_sequences, verbose=False)
+
+        self.formatter = self._chat_formatter()
+        self.rng = np.random.default_rng()
+
+        self._queue = queue.Queue()
+        self._free_ids = list(range(max_sequences))
+        self._idle = OrderedDict()  # session_id -> (seq_id, tokens in its KV cache)
+        self._active = []
+        self._stopped = threading.Event()
+
+        # Aggregate counters for throughput reporting
+        self.generated_tokens = 0
+        self.decode_calls = 0
+        self.prefill_tokens = 0
+        self.reused_tokens = 0
+
+        self._thread = threading.Thread(target=self._loop, name="batch-scheduler", daemon=True)
+        self._thread.start()
+
+    def _chat_formatter(self):
+        from llama_cpp import llama_chat_format
+
+        template = self.llm.metadata.get("tokenizer.chat_template")
+        if not template:
+            raise ValueError("Continuous batching needs a GGUF with an embedded chat template")
+
+        model = self.llm._model
+        eos_id, bos_id = self.llm.token_eos(), self.llm.token_bos()
+        return llama_chat_format.Jinja2ChatFormatter(
+            template=template,
+            eos_token=model.token_get_text(eos_id) if eos_id != -1 else "",
+            bos_token=model.token_get_text(bos_id) if bos_id != -1 else "",
+            stop_token_ids=[eos_id],
+        )
+
+    def close(self):
+        self._stopped.set()
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+    # --- Public API (called from request threads) ---
+
+    def create_chat_completion(self, messages, tools=None, tool_choice=None, max_tokens=None,
+                               temperature=0.2, top_p=0.95, top_k=40, min_p=0.05, session_id=None):
+        """
+        Blocking, create_chat_completion-compatible call served by the shared batch.
+        Calls with the same session_id reuse that session's KV prefix when it is still cached.
+        """
+        formatted = self.formatter(messages=messages, tools=tools, tool_choice=tool_choice)
+        prompt_tokens = self.llm.tokenize(
+            formatted.prompt.encode("utf-8"), add_bos=not formatted.added_special, special=True
+        )
+
+        budget = self.n_ctx_per_seq - len(prompt_tokens)
+        if budget <= 0:
+            raise ValueError(f"Requested tokens ({len(prompt_tokens)}) exceed context window of {self.n_ctx_per_seq}")
+        max_tokens = min(max_tokens or budget, budget)
+
+        seq = _Sequence(prompt_tokens, max_tokens, formatted.stop, {
+            "temperature": temperature, "top_p": top_p, "top_k": top_k, "min_p": min_p
+        }, session_id=session_id)
+        if not self._thread.is_alive():
+            raise RuntimeError("Batch scheduler is not running")
+        self._queue.put(seq)
+        # Never block forever if the scheduler thread dies with this request still queued
+        while not seq.done.wait(1.0):
+            if not self._thread.is_alive():
+                raise RuntimeError("Batch scheduler stopped before finishing the request")
+        if seq.error:
+            raise seq.error
+
+        return {
+            "object": "chat.completion",
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": seq.text},
+                "finish_reason": seq.finish_reason,
+            }],
+            "usage": {
+                "prompt_tokens": len(prompt_tokens),
+                "completion_tokens": len(seq.output),
+                "total_tokens": len(prompt_tokens) + len(seq.output),
+                "cached_tokens": seq.reused,
+            },
+        }
+
+    # --- Scheduler thread ---
+
+    def _loop(self):
+        while not self._stopped.is_set():
+            if not self._admit_waiting():
+                break
+            try:
+                self._step()
+            except Exception as e:
+                for seq in list(self._active):
+                    self._fail(seq, e)
+
+    def _admit_waiting(self) -> bool:
+        """Admits queued requests into free slots. Returns False once close() was called."""
+        # Block only when idle; otherwise admit whatever has arrived and keep stepping
+        if not self._active:
+            seq = self._queue.get()
+            if seq is None:
+                return False
+            self._try_admit(seq)
+        while self._free_ids or self._idle:
+            try:
+                seq = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if seq is None:
+                return False
+            self._try_admit(seq)
+        return True
+
+    def _try_admit(self, seq):
+        try:
+            self._admit(seq)
+        except Exception as e:
+            self._fail(seq, e)
+
+    def _admit(self, seq):
+        cached = self._idle.pop(seq.session_id, None) if seq.session_id is not None else None
+        if cached:
+            seq.seq_id, tokens = cached
+            prefix = 0
+            for old, new in zip(tokens, seq.prompt_tokens):
+                if old != new:
+                    break
+                prefix += 1
+            # Re-evaluate at least the last prompt token: its logits are needed to sample
+            prefix = min(prefix, len(seq.prompt_tokens) - 1)
+        else:
+            if self._free_ids:
+                seq.seq_id = self._free_ids.pop(0)
+            else:
+                _, (seq.seq_id, _) = self._idle.popitem(last=False)
+            prefix = 0
+        # Slots are cleared here rather than when they are freed, so finishing or failing a
+        # request never touches the KV cache: drop everything past the reused prefix
+        self.ctx.kv_cache_seq_rm(seq.seq_id, prefix, -1)
+
+        seq.n_past = prefix
+        seq.reused = prefix
+        seq.pending = list(seq.prompt_tokens[prefix:])
+        self.reused_tokens += prefix
+        self.prefill_tokens += len(seq.pending)
+        self._active.append(seq)
+
+    def _finish(self, seq, reason):
+        seq.finish_reason = reason
+        self._active.remove(seq)
+        if seq.session_id is not None:
+            stale = self._idle.pop(seq.session_id, None)
+            if stale:
+                self._free_ids.append(stale[0])
+            # The last sampled token was never decoded, so only the first n_past are in the cache
+            self._idle[seq.session_id] = (seq.seq_id, (seq.prompt_tokens + seq.output)[:seq.n_past])
+        else:
+            self._free_ids.append(seq.seq_id)
+        seq.done.set()
+
+    def _fail(self, seq, error):
+        """Wakes the caller with `error` and frees its slot (if it got one)."""
+        seq.error = error
+        if seq in self._active:
+            self._active.remove(seq)
+        if seq.seq_id is not None:
+            self._free_ids.append(seq.seq_id)
+        seq.done.set()
+
+    def _step(self):
+        batch = self.batch.batch
+        batch.n_tokens = 0
+        budget = self.n_batch
+        wants_logits = []
+
+        # Running sequences (one pending token) first, so prefill never stalls generation
+        for seq in sorted(self._active, key=lambda s: len(s.pending)):
+            if budget <= 0:
+                break
+            chunk = seq.pending[:budget]
+            seq.pending = seq.pending[len(chunk):]
+            for token in chunk:
+                i = batch.n_tokens
+                batch.token[i] = token
+                batch.pos[i] = seq.n_past
+                batch.n_seq_id[i] = 1
+                batch.seq_id[i][0] = seq.seq_id
+                batch.logits[i] = False
+                batch.n_tokens += 1
+                seq.n_past += 1
+            budget -= len(chunk)
+            if not seq.pending:
+                batch.logits[batch.n_tokens - 1] = True
+                wants_logits.append((seq, batch.n_tokens - 1))
+
+        if batch.n_tokens == 0:
+            return
+
+        self.ctx.decode(self.batch)
+        self.decode_calls += 1
+
+        for seq, idx in wants_logits:
+            logits = np.ctypeslib.as_array(self.ctx.get_logits_ith(idx), shape=(self.n_vocab,))
+            token = self._sample(logits, seq.sampling)
+            self._accept(seq, token)
+
+    def _sample(self, logits, sampling) -> int:
+        temperature = sampling["temperature"]
+        if temperature <= 0:
+            return int(np.argmax(logits))
+
+        top_k = sampling["top_k"] if sampling["top_k"] > 0 else len(logits)
+        candidates = np.argpartition(logits, -top_k)[-top_k:]
+        scores = logits[candidates].astype(np.float64) / temperature
+        order = np.argsort(-scores)
+        candidates, scores = candidates[order], scores[order]
+
+        probs = np.exp(scores - scores[0])
+        probs /= probs.sum()
+        keep = probs >= sampling["min_p"] * probs[0]
+        keep &= (np.cumsum(probs) - probs) < sampling["top_p"]
+        candidates, probs = candidates[keep], probs[keep]
+        return int(self.rng.choice(candidates, p=probs / probs.sum()))
+
+    def _accept(self, seq, token):
+        if self._llama_cpp.llama_token_is_eog(self.llm._model.model, token):
+            return self._finish(seq, "stop")
+
+        seq.output.append(token)
+        self.generated_tokens += 1
+        seq.text = self.llm.detokenize(seq.output).decode("utf-8", errors="ignore")
+
+        for stop in seq.stop:
+            if stop and stop in seq.text:
+                seq.text = seq.text[:seq.text.index(stop)]
+                return self._finish(seq, "stop")
+
+        if len(seq.output) >= seq.max_tokens:
+            return self._finish(seq, "length")
+
+        seq.pending = [token]
+
+    def stats(self) -> dict:
+        return {
+            "max_sequences": self.max_sequences,
+            "active_sequences": len(self._active),
+            "queued_requests": self._queue.qsize(),
+            "cached_sessions": len(self._idle),
+            "generated_tokens": self.generated_tokens,
+            "decode_calls": self.decode_calls,
+            "prefill_tokens": self.prefill_tokens,
+            "reused_prefix_tokens": self.reused_tokens,
+        }
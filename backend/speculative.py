@@ -0,0 +1,117 @@
+import os
+
+# llama_cpp and numpy are imported on first use so the web tier can import this module cheaply.
+# The draft classes implement llama_cpp's LlamaDraftModel interface: called with the token
+# history, they return the drafted tokens.
+
+# Speculative decoding modes understood by load_model (AGENT_SPECULATIVE)
+SPECULATIVE_MODES = ("off", "prompt_lookup", "draft")
+
+
+def speculative_config_from_env() -> dict:
+    """
+    Reads the per-deployment speculative decoding settings.
+    Defaults to plain decoding so existing deployments are unaffected.
+    """
+    mode = os.environ.get("AGENT_SPECULATIVE", "off").strip().lower()
+    if mode not in SPECULATIVE_MODES:
+        print(f"Unknown AGENT_SPECULATIVE={mode!r}, falling back to 'off'")
+        mode = "off"
+
+    return {
+        "mode": mode,
+        "draft_model_path": os.environ.get("AGENT_DRAFT_MODEL"),
+        "num_pred_tokens": int(os.environ.get("AGENT_SPEC_TOKENS", "10")),
+        "max_ngram_size": int(os.environ.get("AGENT_SPEC_NGRAM", "2")),
+    }
+
+
+class SmallModelDraft:
+    """
+    Drafts tokens greedily with a small GGUF model that shares the main model's vocabulary
+    (e.g. Llama-3.2-1B drafting for Llama-3.2-3B).
+    """
+
+    def __init__(self, model_path: str, num_pred_tokens: int = 10, settings: dict = None):
+        from llama_cpp import Llama
+
+        self.num_pred_tokens = num_pred_tokens
+        # Same settings as the main model (tuned threads/batch, and an n_ctx that fits its history)
+        self.llm = Llama(model_path=model_path, verbose=False, **(settings or {}))
+
+    def __call__(self, input_ids, /, **kwargs):
+        import numpy as np
+
+        draft = []
+        # generate() re-uses the draft model's KV cache for the shared prefix
+        for token in self.llm.generate(input_ids.tolist(), top_k=1, temp=0.0, reset=True):
+            draft.append(token)
+            if len(draft) >= self.num_pred_tokens:
+                break
+        return np.array(draft, dtype=np.intc)
+
+
+class DraftStats:
+    """
+    Wraps a draft model and counts how many drafted tokens the main model accepted.
+
+    llama.cpp calls the draft model after every verification step with the full token
+    history, so the tokens appended since the previous call tell us how much of the
+    previous draft survived.
+    """
+
+    def __init__(self, draft):
+        self.draft = draft
+        self.reset()
+
+    def reset(self):
+        """Clears the counters."""
+        self.proposed = 0
+        self.accepted = 0
+        self.start_completion()
+
+    def start_completion(self):
+        """The last draft of the previous completion is never verified, so drop it."""
+        self._last_len = None
+        self._last_draft = None
+
+    def __call__(self, input_ids, /, **kwargs):
+        import numpy as np
+
+        if self._last_draft is not None and len(input_ids) > self._last_len:
+            appended = input_ids[self._last_len:]
+            matched = 0
+            for drafted, actual in zip(self._last_draft, appended):
+                if drafted != actual:
+                    break
+                matched += 1
+            self.proposed += len(self._last_draft)
+            self.accepted += matched
+
+        draft = np.array(self.draft(input_ids, **kwargs), dtype=np.intc, copy=True)
+        self._last_len = len(input_ids)
+        self._last_draft = draft if len(draft) else None
+        return draft
+
+
+def build_draft_model(config: dict, settings: dict = None):
+    """
+    Returns a DraftStats-wrapped draft model for the configured mode, or None for plain decoding.
+    `settings` are the main model's Llama() keyword arguments, reused for a draft model.
+    """
+    mode = config.get("mode", "off")
+    if mode == "prompt_lookup":
+        from llama_cpp.llama_speculative import LlamaPromptLookupDecoding
+        draft = LlamaPromptLookupDecoding(
+            max_ngram_size=config.get("max_ngram_size", 2),
+            num_pred_tokens=config.get("num_pred_tokens", 10),
+        )
+    elif mode == "draft":
+        path = config.get("draft_model_path")
+        if not path or not os.path.exists(path):
+            raise FileNotFoundError(f"Draft model not found at {path}. Set AGENT_DRAFT_MODEL to a small GGUF file")
+        draft = SmallModelDraft(path, num_pred_tokens=config.get("num_pred_tokens", 10), settings=settings)
+    else:
+        return None
+
+    return DraftStats(draft)
@@ -0,0 +1,188 @@
+import os
+import json
+import time
+import socket
+
+PROFILE_PATH = os.environ.get(
+    "AGENT_CPU_PROFILE",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models", "cpu_profile.json")
+)
+
+# Defaults match what load_model used before tuning existed
+DEFAULT_SETTINGS = {
+    "n_gpu_layers": 0,
+    "n_ctx": 4096,
+    "n_threads": None,
+    "n_threads_batch": None,
+    "n_batch": 512,
+    "n_ubatch": 512,
+    "use_mmap": True,
+    "use_mlock": False,
+}
+
+# Environment overrides always win over the saved profile
+ENV_OVERRIDES = {
+    "AGENT_N_GPU_LAYERS": ("n_gpu_layers", int),
+    "AGENT_N_CTX": ("n_ctx", int),
+    "AGENT_N_THREADS": ("n_threads", int),
+    "AGENT_N_THREADS_BATCH": ("n_threads_batch", int),
+    "AGENT_N_BATCH": ("n_batch", int),
+    "AGENT_N_UBATCH": ("n_ubatch", int),
+    "AGENT_USE_MMAP": ("use_mmap", lambda v: v.strip().lower() in ("1", "true", "yes")),
+    "AGENT_USE_MLOCK": ("use_mlock", lambda v: v.strip().lower() in ("1", "true", "yes")),
+}
+
+# Fixed prompt so profiles from different hosts are comparable
+BENCH_PROMPT = (
+    "You are a Credit Card Analysis Assistant. Summarize these transactions:\n"
+    + "\n".join(
+        f"2025-12-{day:02d} SWIGGY BANGALORE ₹{day * 37.5:.2f}\n2025-12-{day:02d} AMAZON PAY INDIA ₹{day * 112.0:.2f}"
+        for day in range(1, 29)
+    )
+)
+
+
+def load_inference_settings(profile_path: str = PROFILE_PATH) -> dict:
+    """
+    Returns the Llama() keyword arguments for this host:
+    defaults, then the tuned profile (if any), then environment overrides.
+    """
+    settings = dict(DEFAULT_SETTINGS)
+
+    if os.path.exists(profile_path):
+        try:
+            with open(profile_path, encoding="utf-8") as f:
+                profile = json.load(f)
+            settings.update({k: v for k, v in profile.get("settings", {}).items() if k in DEFAULT_SETTINGS})
+        except Exception as e:
+            print(f"Ignoring unreadable CPU profile {profile_path}: {e}")
+
+    for env_name, (key, cast) in ENV_OVERRIDES.items():
+        value = os.environ.get(env_name)
+        if value:
+            settings[key] = cast(value)
+
+    return settings
+
+
+def split_threads(env, workers: int, profile_path: str = PROFILE_PATH) -> int:
+    """
+    Gives each of `workers` processes an equal share of the cores by setting AGENT_N_THREADS
+    and AGENT_N_THREADS_BATCH in `env`, unless the operator pinned them or the profile was
+    tuned for this many workers (tune with --workers N). Returns the per-worker share.
+    """
+    threads = max(1, (os.cpu_count() or 1) // max(1, workers))
+
+    profile_workers = None
+    if os.path.exists(profile_path):
+        try:
+            with open(profile_path, encoding="utf-8") as f:
+                profile_workers = json.load(f).get("workers", 1)
+        except Exception as e:
+            print(f"Ignoring unreadable CPU profile {profile_path}: {e}")
+
+    if profile_workers != workers:
+        if profile_workers is not None:
+            print(f"CPU profile was tuned for {profile_workers} worker(s), not {workers}: "
+                  f"using {threads} threads per worker (re-run tune_cpu.py --workers {workers})")
+        env.setdefault("AGENT_N_THREADS", str(threads))
+        env.setdefault("AGENT_N_THREADS_BATCH", str(threads))
+    return threads
+
+
+def candidate_threads(workers: int = 1) -> list:
+    """Thread counts worth trying when `workers` processes share this host."""
+    budget = max(1, (os.cpu_count() or 1) // max(1, workers))
+    candidates = {budget, max(1, budget // 2), max(1, budget * 3 // 4)}
+    candidates.update(n for n in (2, 4, 6, 8, 12, 16, 24, 32) if n <= budget)
+    return sorted(candidates)
+
+
+def _bench(model_path: str, settings: dict, gen_tokens: int, runs: int = 3) -> dict:
+    """Best of `runs` timed passes, after an untimed warm-up that pages in weights and spins up threads."""
+    from llama_cpp import Llama
+
+    llm = Llama(model_path=model_path, verbose=False, **settings)
+    try:
+        tokens = llm.tokenize(BENCH_PROMPT.encode("utf-8"))
+
+        llm.reset()
+        llm.eval(tokens)
+        llm.eval([llm.sample(top_k=1)])
+
+        prompt_seconds = gen_seconds = float("inf")
+        for _ in range(max(1, runs)):
+            llm.reset()
+            started = time.perf_counter()
+            llm.eval(tokens)
+            prompt_seconds = min(prompt_seconds, time.perf_counter() - started)
+
+            # Token-by-token decode, the shape of generation
+            started = time.perf_counter()
+            for _ in range(gen_tokens):
+                llm.eval([llm.sample(top_k=1)])
+            gen_seconds = min(gen_seconds, time.perf_counter() - started)
+
+        return {
+            "prompt_tokens_per_sec": round(len(tokens) / prompt_seconds, 2),
+            "gen_tokens_per_sec": round(gen_tokens / gen_seconds, 2),
+        }
+    finally:
+        llm.close()
+
+
+def tune(model_path: str, workers: int = 1, gen_tokens: int = 32, use_mlock: bool = False,
+         profile_path: str = PROFILE_PATH, runs: int = 3) -> dict:
+    """
+    Benchmarks n_threads, n_threads_batch and n_batch on this host and saves the best profile.
+
+    Generation is memory-bound and prompt eval is compute-bound, so the two thread counts
+    are tuned separately: n_threads on decode speed, then n_threads_batch x n_batch on
+    prompt-eval speed. n_ubatch (the physical batch llama.cpp actually computes) follows
+    n_batch, otherwise batches above its default of 512 are split and measure the same.
+    """
+    base = dict(DEFAULT_SETTINGS, use_mlock=use_mlock)
+    threads = candidate_threads(workers)
+    trials = []
+
+    print(f"Tuning on {os.cpu_count()} CPUs ({workers} worker(s) per host), threads: {threads}")
+
+    best_gen = None
+    for n in threads:
+        settings = dict(base, n_threads=n, n_threads_batch=n)
+        result = _bench(model_path, settings, gen_tokens, runs)
+        trials.append({"settings": settings, **result})
+        print(f"  n_threads={n:<3} decode {result['gen_tokens_per_sec']} tok/s")
+        if best_gen is None or result["gen_tokens_per_sec"] > best_gen[1]:
+            best_gen = (n, result["gen_tokens_per_sec"])
+
+    best_prompt = None
+    for n_batch in (128, 256, 512, 1024):
+        for n in threads:
+            settings = dict(base, n_threads=best_gen[0], n_threads_batch=n, n_batch=n_batch, n_ubatch=n_batch)
+            result = _bench(model_path, settings, 1, runs)
+            trials.append({"settings": settings, **result})
+            print(f"  n_threads_batch={n:<3} n_batch={n_batch:<5} prompt {result['prompt_tokens_per_sec']} tok/s")
+            if best_prompt is None or result["prompt_tokens_per_sec"] > best_prompt[2]:
+                best_prompt = (n, n_batch, result["prompt_tokens_per_sec"])
+
+    best = dict(base, n_threads=best_gen[0], n_threads_batch=best_prompt[0],
+                n_batch=best_prompt[1], n_ubatch=best_prompt[1])
+    profile = {
+        "host": socket.gethostname(),
+        "cpu_count": os.cpu_count(),
+        "workers": workers,
+        "model": os.path.basename(model_path),
+        "tuned_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "settings": best,
+        "gen_tokens_per_sec": best_gen[1],
+        "prompt_tokens_per_sec": best_prompt[2],
+        "trials": trials,
+    }
+
+    os.makedirs(os.path.dirname(profile_path), exist_ok=True)
+    with open(profile_path, "w", encoding="utf-8") as f:
+        json.dump(profile, f, indent=2)
+
+    print(f"Saved profile to {profile_path}: {best}")
+    return profile
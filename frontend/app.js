@@ -12,6 +12,8 @@ const statsGrid = document.getElementById('stats-grid');
 // State
 let uploadedFiles = [];
 let currentStats = null;
+// One conversation per browser tab (randomUUID needs a secure context, so fall back for plain HTTP)
+const sessionId = window.crypto && crypto.randomUUID ? crypto.randomUUID() : `${Date.now()}-${Math.random().toString(16).slice(2)}`;
 
 // File Upload Logic
 browseBtn.addEventListener('click', () => fileInput.click());
@@ -181,7 +183,8 @@ async function sendMessage() {
         const res = await fetch('/chat', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ message: text })
+            // Debug logs (with up to 2000 chars of tool output per step) are only requested while the debugger is open
+            body: JSON.stringify({ message: text, session_id: sessionId, debug: isDebuggerOpen() ? 'full' : 'off' })
         });
         const data = await res.json();
 
@@ -288,6 +291,11 @@ function copyToClipboard(text, button) {
 // Initialize
 console.log('💳 Agentic Analyst loaded successfully');
 
+function isDebuggerOpen() {
+    const consoleDiv = document.getElementById('debug-console');
+    return consoleDiv && !consoleDiv.classList.contains('hidden');
+}
+
 function toggleDebugger() {
     const consoleDiv = document.getElementById('debug-console');
     consoleDiv.classList.toggle('hidden');
@@ -323,6 +331,7 @@ function renderDebugLogs(logs) {
         if (log.type === 'system') icon = '⚙️';
         if (log.type === 'warning') icon = '⚠️';
         if (log.type === 'nudge') icon = '👉';
+        if (log.type === 'metrics') icon = '📈';
 
         const detailsHtml = log.details ? `<div class="log-details">${escapeHtml(log.details)}</div>` : '';
 
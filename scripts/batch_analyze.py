@@ -0,0 +1,44 @@
+"""
+Runs a fixed report over a directory of statements, e.g. as a nightly job.
+
+Usage:
+    python scripts/batch_analyze.py statements/ --output results.jsonl
+    python scripts/batch_analyze.py statements/ --spec report.json --workers 4 --parquet results.parquet
+    python scripts/batch_analyze.py statements/ --question "How much did I spend on food?"
+
+report.json:
+    {"tools": [{"name": "summarize_spending", "parameters": {"group_by": "category"}}],
+     "questions": ["What are my top 5 expenses?"]}
+
+Re-running with the same --output resumes where the previous run stopped.
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.batch import load_spec, run_batch, jsonl_to_parquet
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batch analysis over a directory of statements")
+    parser.add_argument("input_dir", help="Directory of PDFs/CSVs (one sub-directory per customer, or one file per customer)")
+    parser.add_argument("--output", default="batch_results.jsonl")
+    parser.add_argument("--spec", default=None, help="JSON report spec with 'tools' and/or 'questions'")
+    parser.add_argument("--question", action="append", default=[], help="Question for the agent (repeatable)")
+    parser.add_argument("--workers", type=int, default=2, help="Worker processes (one model each when asking questions)")
+    parser.add_argument("--password", default=None, help="Password for encrypted PDFs")
+    parser.add_argument("--no-resume", action="store_true", help="Start over instead of skipping finished customers")
+    parser.add_argument("--parquet", default=None, help="Also write the results as Parquet")
+    parser.add_argument("--charts-dir", default=None, help="Where chart PNGs go (default: <output>_charts/ next to --output)")
+    args = parser.parse_args()
+
+    spec = load_spec(args.spec, args.question)
+    stats = run_batch(args.input_dir, args.output, spec, workers=args.workers,
+                      password=args.password, resume=not args.no_resume, charts_dir=args.charts_dir)
+    print(json.dumps(stats, indent=2))
+
+    if args.parquet:
+        jsonl_to_parquet(args.output, args.parquet)
+        print(f"Wrote {args.parquet}")
@@ -0,0 +1,74 @@
+"""
+Measures aggregate decode throughput of continuous batching as concurrent users grow,
+then the prefill cost of one session's follow-up call with and without its cached KV prefix.
+
+Usage:
+    python scripts/bench_batching.py --max-sequences 8 --max-tokens 128
+"""
+import argparse
+import os
+import sys
+import time
+import threading
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.agent import LocalAgent
+from backend.scheduler import BatchScheduler
+from backend.tuning import load_inference_settings
+
+PROMPT = [
+    {"role": "system", "content": "You are a Credit Card Analysis Assistant. ALWAYS use the Indian Rupee symbol (₹)."},
+    {"role": "user", "content": "Explain in a few sentences how to cut down on food delivery spending."},
+]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark continuous batching throughput")
+    parser.add_argument("--max-sequences", type=int, default=4)
+    parser.add_argument("--max-tokens", type=int, default=128)
+    args = parser.parse_args()
+
+    os.environ["AGENT_MAX_SEQUENCES"] = "1"  # build the scheduler ourselves below
+    agent = LocalAgent()
+    agent.load_model()
+    settings = load_inference_settings()
+    scheduler = BatchScheduler(agent.llm, max_sequences=args.max_sequences, n_ctx_per_seq=settings["n_ctx"])
+
+    print(f"{'users':>6}{'tokens':>10}{'seconds':>10}{'tok/s':>10}")
+    users = 1
+    while users <= args.max_sequences:
+        completion_tokens = []
+
+        def run():
+            response = scheduler.create_chat_completion(PROMPT, max_tokens=args.max_tokens)
+            completion_tokens.append(response["usage"]["completion_tokens"])
+
+        threads = [threading.Thread(target=run) for _ in range(users)]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        seconds = time.perf_counter() - started
+
+        total = sum(completion_tokens)
+        print(f"{users:>6}{total:>10}{seconds:>10.2f}{total / seconds:>10.2f}")
+        users *= 2
+
+    # The agent loop re-sends the whole conversation on every step; with a session_id the
+    # scheduler keeps that session's KV and only prefills what was appended since.
+    print(f"\n{'follow-up':>12}{'prefill':>10}{'reused':>10}{'seconds':>10}")
+    first = scheduler.create_chat_completion(PROMPT, max_tokens=args.max_tokens, session_id="bench")
+    follow_up = PROMPT + [
+        {"role": "assistant", "content": first["choices"][0]["message"]["content"]},
+        {"role": "user", "content": "Summarize that in one sentence."},
+    ]
+    for label, session_id in (("cold", None), ("session", "bench")):
+        before = scheduler.stats()["prefill_tokens"]
+        started = time.perf_counter()
+        response = scheduler.create_chat_completion(follow_up, max_tokens=1, session_id=session_id)
+        seconds = time.perf_counter() - started
+        prefilled = scheduler.stats()["prefill_tokens"] - before
+        print(f"{label:>12}{prefilled:>10}{response['usage']['cached_tokens']:>10}{seconds:>10.2f}")
+
+    scheduler.close()
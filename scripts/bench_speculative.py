@@ -0,0 +1,87 @@
+"""
+Replays recorded chat sessions with plain decoding and with speculative decoding
+and compares tokens/sec and accepted-token rate.
+
+Usage:
+    python scripts/bench_speculative.py --statement statement.csv --sessions sessions.json
+    python scripts/bench_speculative.py ... --modes off prompt_lookup draft --draft-model models/Llama-3.2-1B-Instruct-Q4_K_M.gguf
+
+sessions.json is a list of sessions, each a list of user messages:
+    [["How much did I spend on food?", "Show me the Swiggy orders"], ["Chart my spending by month"]]
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.agent import LocalAgent
+from backend.data_ingestion import load_statement, categorize_merchant
+from backend.mcp_server import set_dataframe
+from backend.speculative import SPECULATIVE_MODES
+
+
+def run_mode(mode, sessions, args):
+    agent = LocalAgent(speculative={
+        "mode": mode,
+        "draft_model_path": args.draft_model,
+        "num_pred_tokens": args.num_pred_tokens,
+        "max_ngram_size": args.max_ngram_size,
+    })
+    agent.load_model()
+
+    totals = {"completion_tokens": 0, "completion_seconds": 0.0, "proposed": 0, "accepted": 0}
+    for session in sessions:
+        agent.messages = []
+        for query in session:
+            agent.chat(query)
+            metrics = agent.last_metrics
+            totals["completion_tokens"] += metrics["completion_tokens"]
+            totals["completion_seconds"] += metrics["completion_seconds"]
+            totals["proposed"] += metrics.get("draft_tokens_proposed", 0)
+            totals["accepted"] += metrics.get("draft_tokens_accepted", 0)
+
+    seconds = totals["completion_seconds"]
+    return {
+        "mode": mode,
+        "completion_tokens": totals["completion_tokens"],
+        "completion_seconds": round(seconds, 2),
+        "tokens_per_sec": round(totals["completion_tokens"] / seconds, 2) if seconds else 0.0,
+        "accepted_token_rate": round(totals["accepted"] / totals["proposed"], 3) if totals["proposed"] else None,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark speculative decoding against plain decoding")
+    parser.add_argument("--statement", required=True, help="CSV/PDF statement loaded before replaying")
+    parser.add_argument("--password", default=None)
+    parser.add_argument("--sessions", required=True, help="JSON file with recorded sessions")
+    parser.add_argument("--modes", nargs="+", default=["off", "prompt_lookup"], choices=SPECULATIVE_MODES)
+    parser.add_argument("--draft-model", default=os.environ.get("AGENT_DRAFT_MODEL"))
+    parser.add_argument("--num-pred-tokens", type=int, default=10)
+    parser.add_argument("--max-ngram-size", type=int, default=2)
+    args = parser.parse_args()
+
+    df = load_statement(args.statement, args.password)
+    if df.empty:
+        sys.exit(f"Could not parse {args.statement}")
+    if 'category' not in df.columns:
+        df['category'] = df['description'].apply(categorize_merchant)
+    set_dataframe(df)
+
+    with open(args.sessions, encoding="utf-8") as f:
+        sessions = json.load(f)
+
+    results = [run_mode(mode, sessions, args) for mode in args.modes]
+
+    print(f"\n{'mode':<15}{'tokens':>10}{'seconds':>10}{'tok/s':>10}{'accepted':>10}")
+    for r in results:
+        rate = "-" if r["accepted_token_rate"] is None else f"{r['accepted_token_rate']:.1%}"
+        print(f"{r['mode']:<15}{r['completion_tokens']:>10}{r['completion_seconds']:>10}{r['tokens_per_sec']:>10}{rate:>10}")
+
+    baseline = next((r for r in results if r["mode"] == "off"), None)
+    if baseline and baseline["tokens_per_sec"]:
+        for r in results:
+            if r is not baseline:
+                print(f"{r['mode']}: {r['tokens_per_sec'] / baseline['tokens_per_sec']:.2f}x vs plain decoding")
@@ -0,0 +1,82 @@
+"""
+Startup benchmark: measures cold import time of backend modules in fresh interpreters
+and fails if a module is over budget or eagerly imports a heavy dependency.
+
+Usage:
+    python scripts/bench_startup.py
+    AGENT_IMPORT_BUDGET_SCALE=2 python scripts/bench_startup.py   # slower CI machines
+    python scripts/bench_startup.py --no-timing                   # eager-import check only
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Cold import budgets in milliseconds (best of several runs)
+BUDGETS_MS = {
+    "backend.data_ingestion": 150,
+    "backend.main": 1000,
+}
+
+# Must only be imported on first use
+LAZY_MODULES = ["llama_cpp", "pandas", "pypdf", "dateutil", "matplotlib", "mcp", "numpy"]
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = (time.perf_counter() - started) * 1000
+print(json.dumps({{"ms": elapsed, "loaded": [m for m in {lazy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(module: str, runs: int = 5) -> dict:
+    results = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", PROBE.format(module=module, lazy=LAZY_MODULES)],
+            cwd=ROOT, capture_output=True, text=True
+        )
+        if out.returncode != 0:
+            raise RuntimeError(f"import {module} failed: {out.stderr.strip().splitlines()[-1]}")
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return {"ms": round(min(r["ms"] for r in results), 1), "loaded": results[0]["loaded"]}
+
+
+def check_budgets(timing: bool = True) -> list:
+    """
+    Returns a list of failures (empty when every module is within budget).
+    With timing=False only eager imports are checked, which doesn't depend on machine load.
+    """
+    scale = float(os.environ.get("AGENT_IMPORT_BUDGET_SCALE", "1"))
+    failures = []
+    for module, budget in BUDGETS_MS.items():
+        try:
+            result = measure(module, runs=5 if timing else 1)
+        except RuntimeError as e:
+            print(e)
+            failures.append(str(e))
+            continue
+        limit = budget * scale
+        over = timing and result["ms"] > limit
+        status = "FAIL" if over or result["loaded"] else "ok"
+        print(f"{module:<25}{result['ms']:>8} ms  (budget {limit:.0f} ms)  eager: {result['loaded'] or '-'}  {status}")
+        if over:
+            failures.append(f"{module} took {result['ms']} ms (budget {limit:.0f} ms)")
+        if result["loaded"]:
+            failures.append(f"{module} eagerly imports {', '.join(result['loaded'])}")
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check backend import time and lazy imports")
+    parser.add_argument("--no-timing", action="store_true", help="Only check for eagerly imported heavy modules")
+    args = parser.parse_args()
+
+    failures = check_budgets(timing=not args.no_timing)
+    if failures:
+        print("\n".join(failures))
+        sys.exit(1)
@@ -0,0 +1,64 @@
+"""
+Runs several model workers on this machine (and optionally the web tier pointed at them).
+Crashed workers are restarted; the web tier routes around them meanwhile.
+
+Usage:
+    python scripts/run_model_pool.py --workers 4                 # workers on ports 9001-9004
+    python scripts/run_model_pool.py --workers 4 --web-port 8001 # plus the FastAPI app
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from backend.tuning import split_threads
+
+
+def start_worker(port, env):
+    return subprocess.Popen([sys.executable, "-m", "backend.model_server", "--port", str(port)], cwd=ROOT, env=env)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local pool of model worker processes")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--base-port", type=int, default=9001)
+    parser.add_argument("--web-port", type=int, default=None, help="Also start the web app on this port")
+    args = parser.parse_args()
+
+    worker_env = dict(os.environ)
+    worker_env.pop("AGENT_MODEL_WORKERS", None)
+    split_threads(worker_env, args.workers)
+
+    ports = [args.base_port + i for i in range(args.workers)]
+    workers = {port: start_worker(port, worker_env) for port in ports}
+    urls = ",".join(f"http://127.0.0.1:{port}" for port in ports)
+    print(f"Started {args.workers} model workers ({worker_env.get('AGENT_N_THREADS', 'tuned profile')} threads each)")
+    print(f"AGENT_MODEL_WORKERS={urls}")
+
+    web = None
+    if args.web_port:
+        web_env = dict(os.environ, AGENT_MODEL_WORKERS=urls)
+        web = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "backend.main:app", "--host", "0.0.0.0", "--port", str(args.web_port)],
+            cwd=ROOT, env=web_env
+        )
+
+    try:
+        while True:
+            time.sleep(2)
+            for port, proc in workers.items():
+                if proc.poll() is not None:
+                    print(f"⚠️ Worker on port {port} exited with {proc.returncode}, restarting")
+                    workers[port] = start_worker(port, worker_env)
+            if web is not None and web.poll() is not None:
+                print(f"Web app exited with {web.returncode}")
+                break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for proc in list(workers.values()) + ([web] if web else []):
+            proc.terminate()
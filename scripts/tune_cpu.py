@@ -0,0 +1,32 @@
+"""
+Benchmarks CPU inference settings on this host and saves the best profile,
+which LocalAgent.load_model applies at startup.
+
+Usage:
+    python scripts/tune_cpu.py                 # one worker per host
+    python scripts/tune_cpu.py --workers 4     # 4 processes share this host's cores
+"""
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.agent import LocalAgent
+from backend.tuning import tune, PROFILE_PATH
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tune n_threads, n_threads_batch and n_batch for this host")
+    parser.add_argument("--model", default=LocalAgent().model_path)
+    parser.add_argument("--workers", type=int, default=1, help="Model processes sharing this host")
+    parser.add_argument("--gen-tokens", type=int, default=32, help="Tokens decoded per trial")
+    parser.add_argument("--runs", type=int, default=3, help="Timed runs per trial (best one counts)")
+    parser.add_argument("--mlock", action="store_true", help="Lock model pages in RAM (needs enough memory)")
+    parser.add_argument("--output", default=PROFILE_PATH)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.model):
+        sys.exit(f"Model not found at {args.model}. Please run download_model.py")
+
+    tune(args.model, workers=args.workers, gen_tokens=args.gen_tokens, use_mlock=args.mlock, profile_path=args.output,
+         runs=args.runs)
@@ -1,44 +1,130 @@
 import unittest
-import json
-import re
 import sys
 import os
+import threading
+import time
+from collections import OrderedDict
+from unittest import mock
 
 # Add project root to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-class TestAgentLogic(unittest.TestCase):
-    def extract_tool_call(self, content):
-        """The logic currently in agent.py but isolated for testing."""
-        if '"name"' in content and '{' in content and '}' in content:
-            start = content.find('{')
-            end = content.rfind('}') + 1
-            json_str = content[start:end]
-            try:
-                loaded = json.loads(json_str)
-                if "name" in loaded:
-                    return loaded
-            except:
-                pass
-        return None
+import backend.agent
+from backend.agent import LocalAgent, extract_tool_call, get_session_agent
 
+class TestAgentLogic(unittest.TestCase):
     def test_detect_raw_json(self):
         content = '{"name": "summarize_spending", "parameters": {"group_by": "category"}}'
-        call = self.extract_tool_call(content)
+        call = extract_tool_call(content)
         self.assertIsNotNone(call)
         self.assertEqual(call["name"], "summarize_spending")
 
     def test_detect_json_in_markdown(self):
         content = 'Certainly! Here is the summary: ```json\n{"name": "read_transactions", "parameters": {"category": "food"}}\n```'
-        call = self.extract_tool_call(content)
+        call = extract_tool_call(content)
         self.assertIsNotNone(call)
         self.assertEqual(call["name"], "read_transactions")
         
     def test_detect_json_with_parameters_key(self):
         content = '{"name": "read_transactions", "parameters": {"category": "food"}}'
-        call = self.extract_tool_call(content)
+        call = extract_tool_call(content)
         self.assertIsNotNone(call)
         self.assertEqual(call["parameters"]["category"], "food")
 
+class TestRouterGrammar(unittest.TestCase):
+    def test_grammar_lists_only_known_tools(self):
+        from backend.cascade import build_tool_grammar, ANSWER_SENTINEL
+        grammar = build_tool_grammar([
+            {"function": {"name": "read_transactions"}},
+            {"function": {"name": "summarize_spending"}},
+        ])
+        self.assertIn('name ::= "\\"read_transactions\\"" | "\\"summarize_spending\\""', grammar)
+        self.assertIn(f'root ::= call | "{ANSWER_SENTINEL}"', grammar)
+
+class StubRouter:
+    def __init__(self, content):
+        self.content = content
+
+    def create_chat_completion(self, **kwargs):
+        return {"choices": [{"message": {"role": "assistant", "content": self.content}}]}
+
+class TestCascade(unittest.TestCase):
+    MAIN = {"choices": [{"message": {"role": "assistant", "content": "main model"}}]}
+
+    def next_response(self, router_output, executed_tools=()):
+        agent = LocalAgent(speculative={"mode": "off"})
+        agent.router = StubRouter(router_output)
+        agent._complete = lambda: self.MAIN
+        agent.messages = [{"role": "user", "content": "How much did I spend on food?"}]
+        agent.last_metrics = {"router_calls": 0, "router_tool_calls": 0, "escalations": 0, "router_seconds": 0.0}
+        debug_logs = []
+        response = agent._next_response(set(executed_tools), debug_logs, 0)
+        return response, agent.last_metrics, debug_logs
+
+    def test_new_tool_call_is_routed(self):
+        call = '{"name": "read_transactions", "parameters": {"category": "food"}}'
+        response, metrics, debug_logs = self.next_response(call)
+        self.assertEqual(response["choices"][0]["message"]["content"], call)
+        self.assertEqual((metrics["router_tool_calls"], metrics["escalations"]), (1, 0))
+        self.assertEqual(debug_logs, [])
+
+    def test_repeated_call_escalates(self):
+        call = '{"name": "read_transactions", "parameters": {"category": "food"}}'
+        response, metrics, debug_logs = self.next_response(call, ['read_transactions:{"category": "food"}'])
+        self.assertIs(response, self.MAIN)
+        self.assertEqual(metrics["escalations"], 1)
+        self.assertEqual(debug_logs[0]["details"], "Router repeated a tool call")
+
+    def test_answer_escalates(self):
+        from backend.cascade import ANSWER_SENTINEL
+        response, metrics, debug_logs = self.next_response(ANSWER_SENTINEL)
+        self.assertIs(response, self.MAIN)
+        self.assertEqual(debug_logs[0]["details"], "Router: ready to answer")
+
+    def test_invalid_output_escalates(self):
+        for output in ('{"name": "delete_everything", "parameters": {}}', "I think you spent a lot"):
+            response, metrics, debug_logs = self.next_response(output)
+            self.assertIs(response, self.MAIN)
+            self.assertEqual(metrics["escalations"], 1)
+            self.assertEqual(debug_logs[0]["details"], "Router output was not a valid tool call")
+
+class TestSessions(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(backend.agent, "_sessions", OrderedDict())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_default_agent_without_session(self):
+        self.assertIs(get_session_agent(None), backend.agent.agent_instance)
+
+    def test_least_recently_used_session_is_evicted(self):
+        with mock.patch.object(backend.agent, "MAX_SESSIONS", 2):
+            a = get_session_agent("a")
+            get_session_agent("b")
+            self.assertIs(get_session_agent("a"), a)  # "b" is now least recently used
+            get_session_agent("c")
+
+        self.assertEqual(list(backend.agent._sessions), ["a", "c"])
+        self.assertIs(a.shared, backend.agent.agent_instance)
+
+    def test_turns_on_one_agent_are_serialized(self):
+        agent = LocalAgent(speculative={"mode": "off"})
+        running, overlapped = [], []
+
+        def turn(query):
+            overlapped.append(bool(running))
+            running.append(query)
+            time.sleep(0.02)
+            running.remove(query)
+            return query, [], {}
+
+        agent._chat_turn = turn
+        threads = [threading.Thread(target=agent.chat, args=(f"q{i}",)) for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(overlapped, [False] * 4)
+
 if __name__ == '__main__':
     unittest.main()
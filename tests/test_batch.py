@@ -0,0 +1,57 @@
+import unittest
+import json
+import os
+import sys
+import tempfile
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.batch import discover_customers, completed_customers, read_results, load_spec, default_charts_dir
+
+class TestBatchPlanning(unittest.TestCase):
+    def test_discover_customers(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            os.makedirs(os.path.join(tmp, "cust_a"))
+            for name in ("jan.pdf", "feb.CSV", "notes.txt"):
+                open(os.path.join(tmp, "cust_a", name), "w").close()
+            open(os.path.join(tmp, "cust_b.csv"), "w").close()
+
+            customers = discover_customers(tmp)
+
+        self.assertEqual([cid for cid, _ in customers], ["cust_a", "cust_b"])
+        self.assertEqual([os.path.basename(f) for f in customers[0][1]], ["feb.CSV", "jan.pdf"])
+
+    def test_resume_skips_only_successful_customers(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "out.jsonl")
+            with open(path, "w") as f:
+                f.write(json.dumps({"customer_id": "a", "rows": 3}) + "\n")
+                f.write(json.dumps({"customer_id": "b", "error": "bad pdf"}) + "\n")
+                f.write('{"customer_id": "c", "ro')  # interrupted write
+
+            self.assertEqual(completed_customers(path), {"a"})
+
+    def test_read_results_after_resumed_run(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "out.jsonl")
+            with open(path, "w") as f:
+                f.write(json.dumps({"customer_id": "a", "rows": 3}) + "\n")
+                f.write('{"customer_id": "c", "ro\n')  # interrupted write, terminated on resume
+                f.write(json.dumps({"customer_id": "c", "rows": 5}) + "\n")
+
+            records = read_results(path)
+
+        self.assertEqual([r["customer_id"] for r in records], ["a", "c"])
+
+    def test_charts_go_next_to_output(self):
+        charts_dir = default_charts_dir(os.path.join("out", "results.jsonl"))
+        self.assertEqual(charts_dir, os.path.abspath(os.path.join("out", "results_charts")))
+
+    def test_cli_questions_extend_spec(self):
+        spec = load_spec(questions=["Top expenses?"])
+        self.assertEqual(spec["questions"], ["Top expenses?"])
+        self.assertTrue(spec["tools"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+import asyncio
+import os
+import sys
+import tempfile
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.http_cache import cache_control_for, content_etag, CompressionMiddleware, IMMUTABLE, REVALIDATE
+
+class TestHttpCaching(unittest.TestCase):
+    def test_only_hashed_charts_are_immutable(self):
+        self.assertEqual(cache_control_for("frontend/charts/chart_0123456789abcdef.png"), IMMUTABLE)
+        # Legacy random chart names and regular assets must revalidate
+        self.assertEqual(cache_control_for("frontend/charts/chart_00de0b12.png"), REVALIDATE)
+        self.assertEqual(cache_control_for("frontend/app.js"), REVALIDATE)
+
+    def test_etag_follows_content(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "style.css")
+            with open(path, "w") as f:
+                f.write("body { color: red; }")
+            first = content_etag(path, os.stat(path))
+
+            with open(path, "w") as f:
+                f.write("body { color: blue; }")
+            os.utime(path, ns=(os.stat(path).st_atime_ns, os.stat(path).st_mtime_ns + 1))
+            second = content_etag(path, os.stat(path))
+
+        self.assertTrue(first.startswith('"') and first.endswith('"'))
+        self.assertNotEqual(first, second)
+
+    def _etag_sent(self, accept_encoding: str) -> str:
+        async def app(scope, receive, send):
+            await send({"type": "http.response.start", "status": 200,
+                        "headers": [(b"content-type", b"text/css"), (b"etag", b'"abc"')]})
+            await send({"type": "http.response.body", "body": b"body { color: red; }" * 100})
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {"type": "http", "method": "GET", "path": "/style.css",
+                 "headers": [(b"accept-encoding", accept_encoding.encode())]}
+        asyncio.run(CompressionMiddleware(app)(scope, receive, send))
+        return dict(sent[0]["headers"])[b"etag"].decode()
+
+    def test_compressed_body_gets_weak_etag(self):
+        self.assertEqual(self._etag_sent("gzip"), 'W/"abc"')
+        self.assertEqual(self._etag_sent("identity"), '"abc"')
+
+if __name__ == '__main__':
+    unittest.main()
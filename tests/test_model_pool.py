@@ -0,0 +1,54 @@
+import unittest
+import sys
+import os
+from unittest import mock
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.model_pool import ModelPool
+
+class TestModelPoolRouting(unittest.TestCase):
+    def setUp(self):
+        with mock.patch.object(ModelPool, "check_health"):
+            self.pool = ModelPool(["http://w1", "http://w2"], health_interval=3600)
+        for worker in self.pool.workers:
+            worker.healthy = True
+
+    def tearDown(self):
+        self.pool.close()
+
+    def test_least_loaded(self):
+        self.pool.workers[0].in_flight = 2
+        self.assertEqual(self.pool._pick().url, "http://w2")
+
+    def test_session_affinity(self):
+        first = self.pool._pick("session-a")
+        first.in_flight = 5  # busier, but the session's KV prefix is warm there
+        self.assertIs(self.pool._pick("session-a"), first)
+
+    def test_affinity_moves_when_worker_down(self):
+        first = self.pool._pick("session-a")
+        first.healthy = False
+        self.assertIsNot(self.pool._pick("session-a"), first)
+
+    def test_no_healthy_workers(self):
+        for worker in self.pool.workers:
+            worker.healthy = False
+        with self.assertRaises(RuntimeError):
+            self.pool._pick()
+
+    def test_session_id_is_forwarded(self):
+        reply = mock.Mock(ok=True)
+        reply.json.return_value = {"choices": []}
+        with mock.patch.object(self.pool._http, "post", return_value=reply) as post:
+            self.pool.create_chat_completion([{"role": "user", "content": "hi"}], session_id="session-a")
+            self.pool.create_chat_completion([{"role": "user", "content": "hi again"}], session_id="session-a")
+
+        first, second = post.call_args_list
+        self.assertEqual(first.kwargs["json"]["session_id"], "session-a")
+        # Same worker both times, so its cached KV prefix is reused
+        self.assertEqual(first.args[0], second.args[0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+import unittest
+import os
+import sys
+from collections import OrderedDict
+from types import SimpleNamespace
+import numpy as np
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.scheduler import BatchScheduler, _Sequence
+
+EOG = 99
+
+class FakeCtx:
+    def __init__(self):
+        self.removed = []
+        self.fail = False
+
+    def kv_cache_seq_rm(self, seq_id, p0, p1):
+        if self.fail:
+            raise RuntimeError("kv cache error")
+        self.removed.append((seq_id, p0, p1))
+
+def make_scheduler(max_sequences=2):
+    """BatchScheduler without a llama context or scheduler thread: only the bookkeeping is exercised."""
+    scheduler = object.__new__(BatchScheduler)
+    scheduler.ctx = FakeCtx()
+    scheduler.max_sequences = max_sequences
+    scheduler._free_ids = list(range(max_sequences))
+    scheduler._idle = OrderedDict()
+    scheduler._active = []
+    scheduler.generated_tokens = scheduler.prefill_tokens = scheduler.reused_tokens = 0
+    scheduler.rng = np.random.default_rng(0)
+    scheduler.llm = SimpleNamespace(
+        _model=SimpleNamespace(model=None),
+        detokenize=lambda tokens: "".join(chr(ord("a") + t) for t in tokens).encode(),
+    )
+    scheduler._llama_cpp = SimpleNamespace(llama_token_is_eog=lambda model, token: token == EOG)
+    return scheduler
+
+def make_seq(prompt, session_id=None, max_tokens=16, stop=None):
+    return _Sequence(prompt, max_tokens, stop, {}, session_id=session_id)
+
+class TestAdmission(unittest.TestCase):
+    def test_reuses_common_prefix(self):
+        scheduler = make_scheduler()
+        scheduler._idle["s"] = (1, [1, 2, 3, 4, 9])
+        seq = make_seq([1, 2, 3, 4, 5, 6], session_id="s")
+        scheduler._admit(seq)
+
+        self.assertEqual((seq.seq_id, seq.n_past, seq.pending), (1, 4, [5, 6]))
+        self.assertEqual(scheduler.ctx.removed, [(1, 4, -1)])
+        self.assertEqual((scheduler.reused_tokens, scheduler.prefill_tokens), (4, 2))
+
+    def test_identical_prompt_still_evaluates_last_token(self):
+        scheduler = make_scheduler()
+        scheduler._idle["s"] = (0, [1, 2, 3])
+        seq = make_seq([1, 2, 3], session_id="s")
+        scheduler._admit(seq)
+        self.assertEqual((seq.n_past, seq.pending), (2, [3]))
+
+    def test_reclaims_least_recently_used_idle_slot(self):
+        scheduler = make_scheduler()
+        scheduler._free_ids = []
+        scheduler._idle["a"] = (0, [1, 2])
+        scheduler._idle["b"] = (1, [3, 4])
+        seq = make_seq([5, 6], session_id="c")
+        scheduler._admit(seq)
+
+        self.assertEqual(seq.seq_id, 0)
+        self.assertEqual((seq.n_past, seq.pending), (0, [5, 6]))
+        self.assertEqual(list(scheduler._idle), ["b"])
+        self.assertEqual(scheduler.ctx.removed, [(0, 0, -1)])
+
+    def test_failed_admission_wakes_caller_and_frees_slot(self):
+        scheduler = make_scheduler()
+        scheduler.ctx.fail = True
+        seq = make_seq([1, 2])
+        scheduler._try_admit(seq)
+
+        self.assertTrue(seq.done.is_set())
+        self.assertIsInstance(seq.error, RuntimeError)
+        self.assertEqual(sorted(scheduler._free_ids), [0, 1])
+        self.assertEqual(scheduler._active, [])
+
+class TestFinish(unittest.TestCase):
+    def admitted(self, scheduler, **kwargs):
+        seq = make_seq([1, 2, 3], session_id="s", **kwargs)
+        scheduler._admit(seq)
+        seq.n_past += len(seq.pending)  # what _step's decode does
+        return seq
+
+    def test_eog_caches_decoded_tokens(self):
+        scheduler = make_scheduler()
+        seq = self.admitted(scheduler)
+        scheduler._accept(seq, 7)
+        seq.n_past += 1
+        scheduler._accept(seq, EOG)
+
+        self.assertEqual(seq.finish_reason, "stop")
+        self.assertEqual(scheduler._idle["s"], (seq.seq_id, [1, 2, 3, 7]))
+        self.assertTrue(seq.done.is_set())
+
+    def test_length_leaves_undecoded_token_out(self):
+        scheduler = make_scheduler()
+        seq = self.admitted(scheduler, max_tokens=1)
+        scheduler._accept(seq, 7)
+
+        self.assertEqual(seq.finish_reason, "length")
+        self.assertEqual(scheduler._idle["s"], (seq.seq_id, [1, 2, 3]))
+
+    def test_stop_string(self):
+        scheduler = make_scheduler()
+        seq = self.admitted(scheduler, stop=["c"])
+        scheduler._accept(seq, 0)
+        seq.n_past += 1
+        scheduler._accept(seq, 2)  # "c"
+
+        self.assertEqual((seq.finish_reason, seq.text), ("stop", "a"))
+        self.assertEqual(scheduler._idle["s"], (seq.seq_id, [1, 2, 3, 0]))
+
+    def test_sessionless_request_frees_slot(self):
+        scheduler = make_scheduler()
+        seq = make_seq([1, 2, 3])
+        scheduler._admit(seq)
+        seq.n_past = 3
+        scheduler._accept(seq, EOG)
+        self.assertEqual(sorted(scheduler._free_ids), [0, 1])
+        self.assertEqual(len(scheduler._idle), 0)
+
+class TestSampling(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = make_scheduler()
+        self.logits = np.array([1.0, 5.0, 4.9, -2.0], dtype=np.float32)
+
+    def sample(self, **sampling):
+        params = dict({"temperature": 1.0, "top_k": 0, "top_p": 1.0, "min_p": 0.0}, **sampling)
+        return {self.scheduler._sample(self.logits, params) for _ in range(200)}
+
+    def test_greedy(self):
+        self.assertEqual(self.sample(temperature=0), {1})
+
+    def test_top_k(self):
+        self.assertEqual(self.sample(top_k=1), {1})
+        self.assertEqual(self.sample(top_k=2), {1, 2})
+
+    def test_top_p(self):
+        self.assertEqual(self.sample(top_p=0.1), {1})
+
+    def test_min_p(self):
+        # Tokens 0 and 3 are far below min_p * p(top token)
+        self.assertEqual(self.sample(min_p=0.5), {1, 2})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+import os
+import sys
+import numpy as np
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.speculative import DraftStats
+
+class FakeDraft:
+    """Returns queued drafts in order, like a draft model would for successive calls."""
+
+    def __init__(self, drafts):
+        self.drafts = list(drafts)
+
+    def __call__(self, input_ids, /, **kwargs):
+        return np.array(self.drafts.pop(0), dtype=np.intc)
+
+class TestDraftStats(unittest.TestCase):
+    def test_full_acceptance(self):
+        stats = DraftStats(FakeDraft([[5, 6, 7], [8]]))
+        stats(np.array([1, 2, 3], dtype=np.intc))
+        # Main model accepted all three drafted tokens plus its own bonus token
+        stats(np.array([1, 2, 3, 5, 6, 7, 9], dtype=np.intc))
+        self.assertEqual((stats.proposed, stats.accepted), (3, 3))
+
+    def test_partial_rejection(self):
+        stats = DraftStats(FakeDraft([[5, 6, 7], [8]]))
+        stats(np.array([1, 2, 3], dtype=np.intc))
+        # First drafted token accepted, second rejected and replaced
+        stats(np.array([1, 2, 3, 5, 9], dtype=np.intc))
+        self.assertEqual((stats.proposed, stats.accepted), (3, 1))
+
+    def test_empty_draft_is_not_counted(self):
+        stats = DraftStats(FakeDraft([[], [4]]))
+        draft = stats(np.array([1, 2, 3], dtype=np.intc))
+        self.assertEqual(len(draft), 0)
+        stats(np.array([1, 2, 3, 9], dtype=np.intc))
+        self.assertEqual((stats.proposed, stats.accepted), (0, 0))
+
+    def test_start_completion_drops_unverified_draft(self):
+        stats = DraftStats(FakeDraft([[5, 6], [7]]))
+        stats(np.array([1, 2], dtype=np.intc))
+        stats.start_completion()
+        stats(np.array([1, 2, 5, 6], dtype=np.intc))
+        self.assertEqual((stats.proposed, stats.accepted), (0, 0))
+
+if __name__ == '__main__':
+    unittest.main()
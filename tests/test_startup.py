@@ -0,0 +1,26 @@
+import unittest
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def run_bench(*args):
+    return subprocess.run(
+        [sys.executable, os.path.join(ROOT, "scripts", "bench_startup.py"), *args],
+        cwd=ROOT, capture_output=True, text=True
+    )
+
+class TestStartupBudget(unittest.TestCase):
+    def test_no_eager_heavy_imports(self):
+        """backend.main and backend.data_ingestion import without llama_cpp, pandas, matplotlib, ..."""
+        result = run_bench("--no-timing")
+        self.assertEqual(result.returncode, 0, result.stdout + result.stderr)
+
+    @unittest.skipUnless(os.environ.get("AGENT_STARTUP_BUDGET"), "wall-clock budget; set AGENT_STARTUP_BUDGET=1 to run")
+    def test_import_time_budget(self):
+        result = run_bench()
+        self.assertEqual(result.returncode, 0, result.stdout + result.stderr)
+
+if __name__ == '__main__':
+    unittest.main()
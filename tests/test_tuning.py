@@ -0,0 +1,59 @@
+import unittest
+import json
+import os
+import sys
+import tempfile
+from unittest import mock
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.tuning import load_inference_settings, candidate_threads, split_threads, DEFAULT_SETTINGS
+
+class TestInferenceSettings(unittest.TestCase):
+    def test_defaults_without_profile(self):
+        with mock.patch.dict(os.environ, {}, clear=True):
+            settings = load_inference_settings("does_not_exist.json")
+        self.assertEqual(settings, DEFAULT_SETTINGS)
+
+    def test_profile_then_env_override(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cpu_profile.json")
+            with open(path, "w") as f:
+                json.dump({"settings": {"n_threads": 6, "n_batch": 256, "bogus": 1}}, f)
+
+            with mock.patch.dict(os.environ, {"AGENT_N_BATCH": "1024", "AGENT_USE_MLOCK": "true"}, clear=True):
+                settings = load_inference_settings(path)
+
+        self.assertEqual(settings["n_threads"], 6)
+        self.assertEqual(settings["n_batch"], 1024)
+        self.assertTrue(settings["use_mlock"])
+        self.assertNotIn("bogus", settings)
+
+    def test_candidate_threads_respect_workers(self):
+        with mock.patch("os.cpu_count", return_value=16):
+            self.assertEqual(max(candidate_threads(1)), 16)
+            self.assertEqual(max(candidate_threads(4)), 4)
+
+    def test_split_threads_yields_to_profile(self):
+        with tempfile.TemporaryDirectory() as tmp, mock.patch("os.cpu_count", return_value=16):
+            path = os.path.join(tmp, "cpu_profile.json")
+            env = {}
+            split_threads(env, 4, path)
+            self.assertEqual(env, {"AGENT_N_THREADS": "4", "AGENT_N_THREADS_BATCH": "4"})
+
+            with open(path, "w") as f:
+                json.dump({"workers": 4, "settings": {"n_threads": 6}}, f)
+            env = {}
+            split_threads(env, 4, path)
+            self.assertEqual(env, {})
+
+            # A single-process profile would give every worker all the cores
+            with open(path, "w") as f:
+                json.dump({"workers": 1, "settings": {"n_threads": 16}}, f)
+            env = {}
+            split_threads(env, 4, path)
+            self.assertEqual(env, {"AGENT_N_THREADS": "4", "AGENT_N_THREADS_BATCH": "4"})
+
+if __name__ == '__main__':
+    unittest.main()